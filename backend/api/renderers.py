@@ -0,0 +1,70 @@
+import math
+
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+# Fallback for types orjson can't serialize on its own (Decimal, lazy
+# translation strings, timedelta, querysets, ...). Deferring to DRF's encoder
+# keeps the output identical to JSONRenderer for these types.
+default = encoders.JSONEncoder().default
+
+
+def has_non_finite(data):
+    """Returns whether data holds a NaN or infinite float, anywhere"""
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, dict):
+        return any(has_non_finite(k) or has_non_finite(v) for k, v in data.items())
+    if isinstance(data, (list, tuple)):
+        return any(map(has_non_finite, data))
+    return False
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    Renders JSON with orjson, falling back to the stdlib based JSONRenderer
+    when orjson isn't installed, an indented response is requested or the
+    data holds something orjson encodes differently.
+
+    datetimes, dates, times and UUIDs are encoded natively by orjson and
+    Decimals go through `default`. Serializer output (ReturnDict/ReturnList)
+    is encoded in place, without being copied into plain dicts first.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON, returning a bytestring.
+        """
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+
+        if orjson is None or indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers outside 64 bits, which the stdlib encoder handles
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # orjson writes NaN and infinities as null, where JSONRenderer rejects
+        # them (or writes NaN and Infinity when STRICT_JSON is off)
+        if b"null" in ret and has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Match JSONRenderer and keep the output a strict javascript subset
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
@@ -1,3 +1,227 @@
-from django.test import TestCase
+import io
+import math
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase, TestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from benchmarks.startup_profile import import_times, loaded_modules, startup_time
+from .parsers import ORJSONParser
+from .renderers import ORJSONRenderer
+from .throttling import BucketStore, LoginRateThrottle, buckets
+
+User = get_user_model()
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def assertRendersLikeJSONRenderer(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_decimal(self):
+        self.assertRendersLikeJSONRenderer({"price": Decimal("12.50")})
+
+    def test_aware_datetimes(self):
+        self.assertRendersLikeJSONRenderer(
+            [
+                datetime(2025, 7, 10, 6, 13, 5, 123456, tzinfo=timezone.utc),
+                datetime(2025, 7, 10, 6, 13, tzinfo=timezone(timedelta(hours=10))),
+            ]
+        )
+
+    def test_naive_datetime(self):
+        self.assertRendersLikeJSONRenderer(datetime(2025, 7, 10, 6, 13, 5, 123456))
+
+    def test_uuid(self):
+        self.assertRendersLikeJSONRenderer({"id": uuid.uuid4()})
+
+    def test_return_dict(self):
+        self.assertRendersLikeJSONRenderer(
+            ReturnDict({"name": "Pizza Palace", "votes": 3}, serializer=None)
+        )
+
+    def test_non_string_keys(self):
+        self.assertRendersLikeJSONRenderer({2: "a", 2.5: "b", True: "c", None: "d"})
+
+    def test_line_separators(self):
+        self.assertRendersLikeJSONRenderer({"name": "a\u2028b\u2029c"})
+
+    def test_integer_outside_64_bits(self):
+        self.assertRendersLikeJSONRenderer({"big": 2**70, "small": -(2**70)})
+
+    def test_none(self):
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_non_finite_floats(self):
+        for data in [
+            {"radius": math.nan},
+            [1.5, [None, math.inf]],
+            {"scores": (None, -math.inf)},
+            {math.nan: None},
+        ]:
+            with self.subTest(data=data):
+                with self.assertRaisesMessage(ValueError, "Out of range float values"):
+                    ORJSONRenderer().render(data)
+
+    def test_non_finite_floats_without_strict_json(self):
+        class Renderer(ORJSONRenderer):
+            strict = False
+
+        class Expected(JSONRenderer):
+            strict = False
+
+        data = {"a": math.nan, "b": [None, math.inf, -math.inf]}
+        self.assertEqual(Renderer().render(data), Expected().render(data))
+
+
+class ORJSONParserTests(SimpleTestCase):
+    def parse(self, body, **parser_context):
+        return ORJSONParser().parse(io.BytesIO(body), parser_context=parser_context)
+
+    def test_parses_json(self):
+        self.assertEqual(self.parse(b'{"ids": [1, 2]}'), {"ids": [1, 2]})
+
+    def test_other_encodings(self):
+        body = '{"name": "Café"}'.encode("latin-1")
+        self.assertEqual(self.parse(body, encoding="latin-1"), {"name": "Café"})
+
+    def test_bad_input(self):
+        for body in (b"{", b"", b"NaN", b"{'a': 1}", b"\xff"):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                self.parse(body)
+
+
+class FakeTimer:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketThrottleTests(TestCase):
+    def setUp(self):
+        buckets.clear()
+        self.timer = FakeTimer()
+
+    def throttle(self):
+        throttle = LoginRateThrottle()
+        throttle.timer = self.timer
+        return throttle
+
+    def request(self, user=None, ip="10.0.0.1"):
+        request = Request(APIRequestFactory().post("/api/login", REMOTE_ADDR=ip))
+        request.user = user or AnonymousUser()
+        return request
+
+    def allowed(self, request, times):
+        return [self.throttle().allow_request(request, None) for _ in range(times)]
+
+    def test_login_throttled_after_ten_requests(self):
+        client = APIClient()
+        credentials = {"email": "nobody@example.com", "password": "wrong"}
+
+        for _ in range(10):
+            response = client.post("/api/login", credentials, format="json")
+            self.assertEqual(response.status_code, 200)
+
+        response = client.post("/api/login", credentials, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_bucket_refills(self):
+        request = self.request()
+        self.assertEqual(self.allowed(request, 11), [True] * 10 + [False])
+
+        throttle = self.throttle()
+        self.assertFalse(throttle.allow_request(request, None))
+        self.assertAlmostEqual(throttle.wait(), 6)
+
+        # 10/min refills one token every 6 seconds
+        self.timer.now += 6
+        self.assertEqual(self.allowed(request, 2), [True, False])
+
+        self.timer.now += 60
+        self.assertEqual(self.allowed(request, 11), [True] * 10 + [False])
+
+    def test_users_and_ips_have_separate_buckets(self):
+        user = User.objects.create_user(
+            email="user@example.com", display_name="user", password="password"
+        )
+        self.assertEqual(self.allowed(self.request(), 11)[-1], False)
+        self.assertEqual(self.allowed(self.request(ip="10.0.0.2"), 10)[-1], True)
+        self.assertEqual(self.allowed(self.request(user=user), 10)[-1], True)
+
+    def test_least_recently_used_bucket_evicted(self):
+        store = BucketStore(max_entries=2)
+        store.take("a", capacity=1, refill_rate=0.1, now=0)
+        store.take("b", capacity=1, refill_rate=0.1, now=0)
+        self.assertGreater(store.take("a", capacity=1, refill_rate=0.1, now=0), 0)
+
+        store.take("c", capacity=1, refill_rate=0.1, now=0)
+        self.assertEqual(list(store._buckets), ["a", "c"])
+
+        # b was evicted, so it starts again with a full bucket
+        self.assertEqual(store.take("b", capacity=1, refill_rate=0.1, now=0), 0)
+
+
+class LeanWorkerStartupTests(SimpleTestCase):
+    """
+    Imports the WSGI application in fresh interpreters, the way a newly
+    started worker does.
+    """
+
+    # About 1.5x the 250 ms measured with benchmarks/startup_profile.py. Raise
+    # it with STARTUP_IMPORT_BUDGET_MS on slower machines rather than deleting
+    # the test.
+    budget_ms = float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", 375))
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        runs = [import_times(lean=True) for _ in range(3)]
+        cls.times = min(runs, key=startup_time)
+        cls.modules = loaded_modules(lean=True)
+
+    def test_import_time_within_budget(self):
+        elapsed_ms = startup_time(self.times) / 1000
+        self.assertLess(
+            elapsed_ms,
+            self.budget_ms,
+            f"A lean worker took {elapsed_ms:.0f} ms to import, over the "
+            f"{self.budget_ms:.0f} ms budget. See benchmarks/startup_profile.py.",
+        )
+
+    def test_admin_app_installed(self):
+        # Without it, deleting a user doesn't cascade to its admin log entries
+        self.assertIn("django.contrib.admin.models", self.modules)
+
+    def test_urlconf_loaded_at_import(self):
+        self.assertIn("api.views", self.modules)
+        self.assertIn("session.views", self.modules)
+
+
+class DeleteAccountTests(TestCase):
+    def test_deletes_admin_log_entries(self):
+        user = User.objects.create_user(
+            email="user@example.com", display_name="user", password="password"
+        )
+        LogEntry.objects.log_actions(user.pk, [user], ADDITION)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.delete("/api/delete")
+
+        self.assertEqual(response.json(), {"success": "User deleted successfully"})
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertFalse(LogEntry.objects.exists())
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class BucketStore:
+    """
+    A bounded, thread safe LRU mapping of throttle keys to token buckets.
+
+    Each bucket is a (tokens, last_refill) tuple. Once `max_entries` keys are
+    tracked, the least recently used bucket is evicted, which at worst hands
+    an idle client a fresh, full bucket.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, key, capacity, refill_rate, now):
+        """
+        Refills the bucket for `key` and tries to take one token from it.
+
+        Args:
+            key (str): the throttle key
+            capacity (int): the maximum number of tokens in the bucket
+            refill_rate (float): the number of tokens added per second
+            now (float): the current time in seconds
+
+        Returns:
+            float: 0 if a token was taken, otherwise the number of seconds
+            until the next token is available
+        """
+        with self.lock:
+            tokens, last_refill = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last_refill) * refill_rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / refill_rate
+
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+    def clear(self):
+        """Drops every bucket"""
+        with self.lock:
+            self._buckets.clear()
+
+
+buckets = BucketStore()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Limits the rate of requests with an in-process token bucket per client and
+    scope.
+
+    The rate is read from DEFAULT_THROTTLE_RATES like the other DRF throttles.
+    A rate of "10/min" allows bursts of up to 10 requests, refilled at 10
+    tokens per minute. Clients are identified by user id when authenticated
+    and by IP address otherwise.
+    """
+
+    store = buckets
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+    def allow_request(self, request, view):
+        """
+        Takes a token from the client's bucket, rejecting the request if the
+        bucket is empty.
+        """
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self._wait = self.store.take(
+            self.key,
+            capacity=self.num_requests,
+            refill_rate=self.num_requests / self.duration,
+            now=self.timer(),
+        )
+        return self._wait == 0
+
+    def wait(self):
+        """Returns the number of seconds until the next token is available"""
+        return self._wait
+
+
+class LoginRateThrottle(TokenBucketThrottle):
+    scope = "login"
+
+
+class RegisterRateThrottle(TokenBucketThrottle):
+    scope = "register"
+
+
+class SessionWriteRateThrottle(TokenBucketThrottle):
+    scope = "session_write"
@@ -5,6 +5,7 @@ from rest_framework import permissions
 from django.contrib import auth
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_protect
+from .throttling import LoginRateThrottle, RegisterRateThrottle
 
 User = get_user_model()
 
@@ -28,6 +29,7 @@ class CheckAuthenticatedView(APIView):
 @method_decorator(csrf_protect, name="dispatch")
 class RegisterView(APIView):
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = (RegisterRateThrottle,)
 
     def post(self, request):
         data = self.request.data
@@ -65,6 +67,7 @@ class RegisterView(APIView):
 @method_decorator(csrf_protect, name="dispatch")
 class LoginView(APIView):
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = (LoginRateThrottle,)
 
     def post(self, request, format=None):
         data = self.request.data
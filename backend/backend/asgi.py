@@ -14,3 +14,13 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Lean workers load the URLconf, and everything it imports, up front instead
+# of on their first request. Under gunicorn --preload this happens once in the
+# master and is shared by every forked worker.
+from django.conf import settings  # noqa: E402
+
+if settings.LEAN_WORKER:
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
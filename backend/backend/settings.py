@@ -17,7 +17,8 @@ import environ
 
 env = environ.Env(
     # set casting, default value
-    DEBUG=(bool, False)
+    DEBUG=(bool, False),
+    LEAN_WORKER=(bool, False),
 )
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,6 +39,12 @@ DEBUG = env("DEBUG")
 
 ALLOWED_HOSTS = os.environ.get("ALLOWED_HOSTS", "").split(",")
 
+# Lean workers only serve the API: the admin and api-auth routes and the
+# browsable API are left out. django.contrib.admin stays installed so that
+# deleting a user still cascades to its admin log entries. Run at least one
+# regular worker if the admin is needed.
+LEAN_WORKER = env("LEAN_WORKER")
+
 
 # Application definition
 
@@ -72,6 +79,24 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": (
+        ("api.renderers.ORJSONRenderer",)
+        if LEAN_WORKER
+        else (
+            "api.renderers.ORJSONRenderer",
+            "rest_framework.renderers.BrowsableAPIRenderer",
+        )
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "api.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "login": "10/min",
+        "register": "5/min",
+        "session_write": "60/min",
+    },
 }
 
 ROOT_URLCONF = "backend.urls"
@@ -154,3 +179,20 @@ CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOWS_CREDENTIALS = True
 
 AUTH_USER_MODEL = "api.CustomUser"
+
+# Restaurant catalog used for suggestion autocomplete. The index is compiled
+# from the source on first use, or ahead of time with `manage.py build_catalog`.
+RESTAURANT_CATALOG_SOURCE = env(
+    "RESTAURANT_CATALOG_SOURCE",
+    default=os.path.join(BASE_DIR, "session", "data", "restaurants.csv"),
+)
+RESTAURANT_CATALOG_INDEX = env(
+    "RESTAURANT_CATALOG_INDEX",
+    default=os.path.join(BASE_DIR, "restaurant_catalog.idx"),
+)
+
+# Where the restaurant recommender keeps its matrices
+RECOMMENDER_STATE_PATH = env(
+    "RECOMMENDER_STATE_PATH",
+    default=os.path.join(BASE_DIR, "recommender.bin"),
+)
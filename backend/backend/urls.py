@@ -1,12 +1,18 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include, re_path
 from django.views.generic import TemplateView
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('api-auth/', include('rest_framework.urls')),
     path('api/', include('api.urls')), 
     path('session/', include('session.urls')), 
 ]
 
+if not settings.LEAN_WORKER:
+    from django.contrib import admin
+
+    urlpatterns = [
+        path('admin/', admin.site.urls),
+        path('api-auth/', include('rest_framework.urls')),
+    ] + urlpatterns
+
 urlpatterns += [re_path(r'^.*', TemplateView.as_view(template_name='index.html'))] # catchall
\ No newline at end of file
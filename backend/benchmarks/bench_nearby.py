@@ -0,0 +1,101 @@
+"""
+Benchmark of nearest restaurant search on a synthetic catalog, comparing the
+grid index against computing the distance to every entry.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_nearby [--entries N] [--queries N]
+"""
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+from session.catalog import Catalog, build_index, haversine
+
+# (latitude, longitude) of the metro areas most entries are clustered around
+METROS = [
+    (-33.87, 151.21),
+    (-37.81, 144.96),
+    (40.71, -74.01),
+    (51.51, -0.13),
+    (35.68, 139.69),
+    (1.35, 103.82),
+    (37.77, -122.42),
+    (48.86, 2.35),
+]
+
+
+def write_catalog(path, entries, rng):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "popularity", "latitude", "longitude"])
+        for i in range(entries):
+            if rng.random() < 0.9:
+                lat, lon = rng.choice(METROS)
+                lat = max(-90.0, min(90.0, rng.gauss(lat, 0.15)))
+                lon = (rng.gauss(lon, 0.15) + 180) % 360 - 180
+            else:
+                lat, lon = rng.uniform(-60, 70), rng.uniform(-180, 180)
+            writer.writerow([f"Restaurant {i}", rng.randint(0, 10000), lat, lon])
+
+
+def brute_force(catalog, latitude, longitude, radius, limit):
+    found = []
+    for i in range(len(catalog)):
+        distance = haversine(
+            latitude, longitude, catalog.latitude[i], catalog.longitude[i]
+        )
+        if distance <= radius:
+            found.append((distance, i))
+    return [catalog.ids[i] for _, i in sorted(found)[:limit]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "catalog.csv")
+        index = os.path.join(directory, "catalog.idx")
+        write_catalog(source, args.entries, rng)
+
+        start = time.perf_counter()
+        build_index(source, index)
+        print(f"built index of {args.entries} entries in "
+              f"{time.perf_counter() - start:.1f} s "
+              f"({os.path.getsize(index) / 2**20:.1f} MiB)")
+
+        catalog = Catalog(index)
+        points = [
+            (rng.gauss(lat, 0.1), rng.gauss(lon, 0.1))
+            for lat, lon in (rng.choice(METROS) for _ in range(args.queries))
+        ]
+
+        for radius in (1, 5, 20):
+            start = time.perf_counter()
+            for lat, lon in points:
+                catalog.nearby(lat, lon, radius, args.limit)
+            elapsed = (time.perf_counter() - start) / len(points)
+            print(f"grid index, radius {radius:>2} km: {elapsed * 1e3:8.3f} ms/query")
+
+        lat, lon = points[0]
+        start = time.perf_counter()
+        expected = brute_force(catalog, lat, lon, 5, args.limit)
+        elapsed = time.perf_counter() - start
+        print(f"brute force, radius  5 km: {elapsed * 1e3:8.3f} ms/query")
+
+        got = [entry["id"] for entry in catalog.nearby(lat, lon, 5, args.limit)]
+        assert got == expected, "grid index and brute force disagree"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Microbenchmark comparing the stdlib JSONRenderer against ORJSONRenderer on a
+large session snapshot payload.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_renderers [--members N] [--suggestions N]
+"""
+
+import argparse
+import io
+import timeit
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+from django.conf import settings
+
+settings.configure(USE_TZ=True)
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from api.parsers import ORJSONParser  # noqa: E402
+from api.renderers import ORJSONRenderer  # noqa: E402
+
+
+def make_snapshot(members, suggestions):
+    """Builds a session snapshot shaped like the session endpoints' payloads"""
+    now = timezone.now()
+    return {
+        "join_code": "ABCDE",
+        "stage": "4",
+        "date_created": now,
+        "members": [
+            {
+                "id": i,
+                "display_name": f"member{i}",
+                "joined_at": now - timedelta(seconds=i),
+            }
+            for i in range(members)
+        ],
+        "suggestions": [
+            {
+                "id": i,
+                "name": f"Restaurant {i}",
+                "is_banned": i % 7 == 0,
+                "picks": i % 13,
+                "votes": i % 5,
+                "share": Decimal(i % 100) / Decimal(100),
+            }
+            for i in range(suggestions)
+        ],
+    }
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{label:<28} {seconds * 1e3:9.3f} ms")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument("--suggestions", type=int, default=20000)
+    parser.add_argument("--number", type=int, default=10)
+    args = parser.parse_args()
+
+    data = make_snapshot(args.members, args.suggestions)
+    body = ORJSONRenderer().render(data)
+    print(f"payload: {len(body) / 1024:.1f} KiB")
+
+    stdlib = bench("JSONRenderer", lambda: JSONRenderer().render(data), args.number)
+    fast = bench("ORJSONRenderer", lambda: ORJSONRenderer().render(data), args.number)
+    print(f"render speedup: {stdlib / fast:.1f}x")
+
+    stdlib = bench(
+        "JSONParser", lambda: JSONParser().parse(io.BytesIO(body)), args.number
+    )
+    fast = bench(
+        "ORJSONParser", lambda: ORJSONParser().parse(io.BytesIO(body)), args.number
+    )
+    print(f"parse speedup: {stdlib / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
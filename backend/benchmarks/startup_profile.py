@@ -0,0 +1,129 @@
+"""
+Profiles how long a fresh worker takes to import the WSGI application and the
+URLconf it serves its first request with, and which packages that time goes
+to.
+
+Run from the backend directory:
+
+    python -m benchmarks.startup_profile [--lean] [--top N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What a worker imports before it can serve a request
+MODULES = ("backend.wsgi", "backend.urls")
+
+# Packages reported on their own rather than folded into their parent
+GROUPS = (
+    "django.contrib.admin",
+    "django.contrib",
+    "django.db",
+    "django",
+    "rest_framework",
+    "corsheaders",
+    "environ",
+    "asyncio",
+    "api",
+    "session",
+    "backend",
+)
+
+
+def _run(code, lean, *options):
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "startup-profile")
+    if lean:
+        env["LEAN_WORKER"] = "1"
+
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        env=env,
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def loaded_modules(modules=MODULES, lean=False):
+    """Returns the names of every module a fresh worker has loaded"""
+    result = _run(
+        f"import sys, {', '.join(modules)}; print('\\n'.join(sys.modules))", lean
+    )
+    return set(result.stdout.split())
+
+
+def import_times(modules=MODULES, lean=False):
+    """
+    Imports modules in a fresh interpreter with -X importtime.
+
+    Modules loaded through importlib (apps, admin modules, URLconfs) aren't
+    reported on their own, their time counts towards the module that loaded
+    them.
+
+    Returns:
+        dict: the self and cumulative import time in microseconds of every
+        module imported, keyed by module name. The "total" key holds the
+        time of the whole import.
+    """
+    result = _run(f"import {', '.join(modules)}", lean, "-X", "importtime")
+
+    times = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+        # Top level imports are indented by a single space
+        if not name.startswith("  "):
+            total += int(cumulative_us)
+    times["total"] = (0, total)
+    return times
+
+
+def startup_time(times):
+    """Returns the time in microseconds a worker took to import everything"""
+    return times["total"][1]
+
+
+def group_of(name):
+    for group in GROUPS:
+        if name == group or name.startswith(group + "."):
+            return group
+    return "other"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lean", action="store_true", help="set LEAN_WORKER=1")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [import_times(lean=args.lean) for _ in range(args.runs)]
+    times = min(runs, key=startup_time)
+    print(f"{', '.join(MODULES)}: {startup_time(times) / 1000:.1f} ms "
+          f"(best of {args.runs})\n")
+
+    by_group = defaultdict(int)
+    for name, (self_us, _) in times.items():
+        by_group[group_of(name)] += self_us
+    print("self time by package:")
+    for group, us in sorted(by_group.items(), key=lambda item: -item[1]):
+        print(f"  {group:<22} {us / 1000:7.1f} ms")
+
+    print(f"\nslowest {args.top} modules (self time):")
+    slowest = sorted(times.items(), key=lambda item: -item[1][0])[: args.top]
+    for name, (self_us, _) in slowest:
+        print(f"  {name:<50} {self_us / 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,522 @@
+import bisect
+import csv
+import fcntl
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import unicodedata
+from array import array
+
+from django.conf import settings
+
+MAGIC = b"RCATALOG"
+VERSION = 3
+
+SECTIONS = (
+    "key_offsets",
+    "keys",
+    "name_offsets",
+    "names",
+    "popularity",
+    "prefix_offsets",
+    "prefixes",
+    "latitude",
+    "longitude",
+    "cells",
+    "cell_entries",
+    "ids",
+    "id_order",
+)
+# magic, version, count, then (offset, length) for each section
+HEADER = struct.Struct("<8sII" + "QQ" * len(SECTIONS))
+
+# Prefixes matching more entries than this get their top results precomputed,
+# anything narrower is ranked at query time.
+SCAN_LIMIT = 256
+TOP_K = 20
+
+# Ids are stored as unsigned 32 bit integers
+MAX_ID = 2**32 - 1
+
+# Entries with coordinates are bucketed into a grid of CELL_DEGREES cells
+# (about 1.1km north-south). Cell ids are numbered row by row, so the cells of
+# one row overlapping a search radius form a single range of ids.
+CELL_DEGREES = 0.01
+CELL_COLUMNS = round(360 / CELL_DEGREES)
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def normalize(name):
+    """
+    Returns the lookup key of a restaurant name: casefolded, without accents
+    and with whitespace collapsed
+    """
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.split())
+
+
+def cell_of(latitude, longitude):
+    """Returns the id of the grid cell containing a point"""
+    row = min(int((latitude + 90) / CELL_DEGREES), round(180 / CELL_DEGREES) - 1)
+    column = int((longitude + 180) / CELL_DEGREES) % CELL_COLUMNS
+    return row * CELL_COLUMNS + column
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Returns the great circle distance between two points in km"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _coordinate(value):
+    """Parses an optional coordinate, using NaN for a missing one"""
+    if value is None or value == "":
+        return math.nan
+    return float(value)
+
+
+def _source_id(value, position, path):
+    """Parses the id of a source row, defaulting to its position"""
+    if value is None or value == "":
+        return position
+    try:
+        id = int(value)
+    except (TypeError, ValueError):
+        id = -1
+    if not 0 <= id <= MAX_ID:
+        raise ValueError(
+            f"Row {position + 1} of {path} has id {value!r}, ids must be "
+            f"integers from 0 to {MAX_ID}."
+        )
+    return id
+
+
+def read_source(path):
+    """
+    Yields (id, name, popularity, latitude, longitude) tuples from a CSV file
+    with a header row or from an NDJSON file with one object per line. The id
+    is the row's "id" if it has one, otherwise its position in the file.
+    Missing coordinates are NaN.
+
+    Args:
+        path (str): the path of the .csv, .ndjson or .jsonl file
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if str(path).endswith((".ndjson", ".jsonl")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+
+        for position, row in enumerate(rows):
+            name = row["name"].strip()
+            if name:
+                yield (
+                    _source_id(row.get("id"), position, path),
+                    name,
+                    max(int(row.get("popularity") or 0), 0),
+                    _coordinate(row.get("latitude")),
+                    _coordinate(row.get("longitude")),
+                )
+
+
+class _Strings:
+    """A read only sequence of the byte strings packed in a blob"""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i] : self.offsets[i + 1]])
+
+
+def _pack_strings(strings):
+    """Packs byte strings into an offsets array and a blob"""
+    offsets = array("I", [0])
+    for s in strings:
+        offsets.append(offsets[-1] + len(s))
+    return offsets.tobytes(), b"".join(strings)
+
+
+def build_index(source, path):
+    """
+    Compiles a restaurant catalog into an index file.
+
+    Entries are sorted by their normalized name so a prefix matches a
+    contiguous range, found by binary search. Positions in that order change
+    whenever the catalog does, so each entry also keeps its id from the
+    source, with the positions sorted by id to look them up. Prefixes matching more than
+    SCAN_LIMIT entries get their TOP_K most popular entries stored alongside.
+    Entries with coordinates are also listed sorted by grid cell. Arrays are
+    written in native byte order, so the index must be built on the host
+    serving it.
+
+    Args:
+        source (str): the path of the CSV or NDJSON catalog
+        path (str): the path to write the index to
+    """
+    entries = sorted(
+        (normalize(name).encode(), -popularity, name, latitude, longitude, id)
+        for id, name, popularity, latitude, longitude in read_source(source)
+    )
+    ids = array("I", [entry[5] for entry in entries])
+    id_order = array("I", sorted(range(len(ids)), key=ids.__getitem__))
+    for a, b in zip(id_order, id_order[1:]):
+        if ids[a] == ids[b]:
+            raise ValueError(f"{source} has more than one entry with id {ids[a]}.")
+
+    keys = [entry[0] for entry in entries]
+    popularity = array("I", [-entry[1] for entry in entries])
+    latitude = array("d", [entry[3] for entry in entries])
+    longitude = array("d", [entry[4] for entry in entries])
+
+    located = sorted(
+        (cell_of(lat, lon), i)
+        for i, (lat, lon) in enumerate(zip(latitude, longitude))
+        if not (math.isnan(lat) or math.isnan(lon))
+    )
+    cells = array("q", [cell for cell, _ in located])
+    cell_entries = array("I", [i for _, i in located])
+
+    prefixes = []
+    tops = []
+    length = 1
+    while True:
+        found = False
+        lo = 0
+        while lo < len(keys):
+            if len(keys[lo]) < length:
+                lo += 1
+                continue
+            prefix = keys[lo][:length]
+            hi = bisect.bisect_right(
+                keys, prefix, lo=lo, key=lambda k: k[: len(prefix)]
+            )
+            if hi - lo > SCAN_LIMIT:
+                found = True
+                prefixes.append(prefix)
+                top = heapq.nlargest(TOP_K, range(lo, hi), key=popularity.__getitem__)
+                tops.append(top + [0xFFFFFFFF] * (TOP_K - len(top)))
+            lo = hi
+        if not found:
+            break
+        length += 1
+
+    # Sorted so that queries can find their prefix by binary search
+    order = sorted(range(len(prefixes)), key=prefixes.__getitem__)
+    prefixes = [prefixes[i] for i in order]
+    tops = [tops[i] for i in order]
+
+    key_offsets, key_blob = _pack_strings(keys)
+    name_offsets, name_blob = _pack_strings([entry[2].encode() for entry in entries])
+    prefix_offsets, prefix_blob = _pack_strings(prefixes)
+    prefix_top = array("I", [i for top in tops for i in top]).tobytes()
+
+    sections = [
+        key_offsets,
+        key_blob,
+        name_offsets,
+        name_blob,
+        popularity.tobytes(),
+        prefix_offsets,
+        prefix_blob + b"\0" * (-len(prefix_blob) % 8) + prefix_top,
+        latitude.tobytes(),
+        longitude.tobytes(),
+        cells.tobytes(),
+        cell_entries.tobytes(),
+        ids.tobytes(),
+        id_order.tobytes(),
+    ]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            position = HEADER.size
+            table = []
+            for section in sections:
+                position += -position % 8
+                table += [position, len(section)]
+                position += len(section)
+            f.write(HEADER.pack(MAGIC, VERSION, len(entries), *table))
+            for section, offset in zip(sections, table[::2]):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(section)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class Catalog:
+    """
+    A read only view over a memory mapped catalog index.
+
+    The index is mapped rather than read, so every worker process on the host
+    shares the same pages of the OS page cache instead of loading its own
+    copy.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._mmap)
+        magic, version, count, *table = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} catalog index.")
+
+        sections = {
+            name: view[offset : offset + length]
+            for name, offset, length in zip(SECTIONS, table[::2], table[1::2])
+        }
+        self.count = count
+        self.keys = _Strings(sections["key_offsets"].cast("I"), sections["keys"])
+        self.names = _Strings(sections["name_offsets"].cast("I"), sections["names"])
+        self.popularity = sections["popularity"].cast("I")
+
+        prefix_offsets = sections["prefix_offsets"].cast("I")
+        self.prefixes = _Strings(prefix_offsets, sections["prefixes"])
+        blob_length = prefix_offsets[-1] + (-prefix_offsets[-1] % 8)
+        self.prefix_top = sections["prefixes"][blob_length:].cast("I")
+
+        self.latitude = sections["latitude"].cast("d")
+        self.longitude = sections["longitude"].cast("d")
+        self.cells = sections["cells"].cast("q")
+        self.cell_entries = sections["cell_entries"].cast("I")
+        self.ids = sections["ids"].cast("I")
+        self.id_order = sections["id_order"].cast("I")
+
+    def __len__(self):
+        return self.count
+
+    def find(self, id):
+        """Returns the index of the entry with a source id, or None"""
+        i = bisect.bisect_left(self.id_order, id, key=self.ids.__getitem__)
+        if i < len(self.id_order) and self.ids[self.id_order[i]] == id:
+            return self.id_order[i]
+        return None
+
+    def entry(self, i):
+        """Returns the catalog entry at index i"""
+        latitude, longitude = self.latitude[i], self.longitude[i]
+        return {
+            "id": self.ids[i],
+            "name": self.names[i].decode(),
+            "popularity": self.popularity[i],
+            "latitude": None if math.isnan(latitude) else latitude,
+            "longitude": None if math.isnan(longitude) else longitude,
+        }
+
+    def autocomplete(self, query, limit=10):
+        """
+        Returns the most popular entries whose name starts with query.
+
+        Args:
+            query (str): the typed prefix
+            limit (int): the maximum number of results, at most TOP_K
+
+        Returns:
+            list: catalog entries, most popular first
+        """
+        prefix = normalize(query).encode()
+        limit = min(limit, TOP_K)
+        if not prefix or limit <= 0:
+            return []
+
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_right(
+            self.keys, prefix, lo=lo, key=lambda k: k[: len(prefix)]
+        )
+
+        if hi - lo > SCAN_LIMIT:
+            p = bisect.bisect_left(self.prefixes, prefix)
+            top = self.prefix_top[p * TOP_K : p * TOP_K + limit]
+            ids = [i for i in top if i != 0xFFFFFFFF]
+        else:
+            ids = heapq.nlargest(limit, range(lo, hi), key=self.popularity.__getitem__)
+
+        return [self.entry(i) for i in ids]
+
+    def within(self, latitude, longitude, radius):
+        """
+        Returns (distance, index) pairs of every entry within a radius.
+
+        Only the grid cells overlapping the radius are visited: one pair of
+        binary searches per row of cells, then an exact distance check on the
+        entries found.
+
+        Args:
+            latitude (float): the latitude of the point
+            longitude (float): the longitude of the point
+            radius (float): the search radius in km
+        """
+        lat_span = radius / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(abs(latitude) + lat_span, 90)))
+        if cos_lat < 1e-9:
+            lon_span = 180
+        else:
+            lon_span = min(radius / (KM_PER_DEGREE * cos_lat), 180)
+
+        rows = round(180 / CELL_DEGREES)
+        first_row = max(int((latitude - lat_span + 90) / CELL_DEGREES), 0)
+        last_row = min(int((latitude + lat_span + 90) / CELL_DEGREES), rows - 1)
+        first_column = math.floor((longitude - lon_span + 180) / CELL_DEGREES)
+        last_column = math.floor((longitude + lon_span + 180) / CELL_DEGREES)
+
+        if last_column - first_column + 1 >= CELL_COLUMNS:
+            column_ranges = [(0, CELL_COLUMNS - 1)]
+        elif first_column < 0:
+            column_ranges = [
+                (first_column % CELL_COLUMNS, CELL_COLUMNS - 1),
+                (0, last_column),
+            ]
+        elif last_column >= CELL_COLUMNS:
+            column_ranges = [
+                (first_column, CELL_COLUMNS - 1),
+                (0, last_column % CELL_COLUMNS),
+            ]
+        else:
+            column_ranges = [(first_column, last_column)]
+
+        found = []
+        for row in range(first_row, last_row + 1):
+            base = row * CELL_COLUMNS
+            for start, end in column_ranges:
+                lo = bisect.bisect_left(self.cells, base + start)
+                hi = bisect.bisect_right(self.cells, base + end, lo=lo)
+                for i in self.cell_entries[lo:hi]:
+                    distance = haversine(
+                        latitude, longitude, self.latitude[i], self.longitude[i]
+                    )
+                    if distance <= radius:
+                        found.append((distance, i))
+        return found
+
+    def nearby(self, latitude, longitude, radius, limit=10):
+        """
+        Returns the entries closest to a point, within a radius.
+
+        The search starts one cell wide and doubles its radius until it finds
+        `limit` entries or reaches `radius`, so dense areas only check the
+        entries closest to the point.
+
+        Args:
+            latitude (float): the latitude of the point
+            longitude (float): the longitude of the point
+            radius (float): the search radius in km
+            limit (int): the maximum number of results
+
+        Returns:
+            list: catalog entries with their "distance" in km, closest first
+        """
+        if limit <= 0 or radius <= 0:
+            return []
+
+        search_radius = min(radius, CELL_DEGREES * KM_PER_DEGREE)
+        while True:
+            found = self.within(latitude, longitude, search_radius)
+            if len(found) >= limit or search_radius >= radius:
+                break
+            search_radius = min(search_radius * 2, radius)
+
+        return [
+            dict(self.entry(i), distance=distance)
+            for distance, i in heapq.nsmallest(limit, found)
+        ]
+
+
+_catalog = None
+_catalog_mtime = None
+_lock = threading.Lock()
+
+
+def _current_mtime(source, path):
+    """Returns the mtime of the index, or None if it is missing or stale"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return None if mtime < os.stat(source).st_mtime_ns else mtime
+
+
+def _build(source, path, wait, rejected=None):
+    """
+    Rebuilds the index while holding an exclusive lock on a file next to it,
+    unless another process rebuilt it while this one waited for the lock.
+
+    Args:
+        source (str): the path of the catalog
+        path (str): the path of the index
+        wait (bool): whether to wait for a process already building the index
+        rejected (int): the mtime of an index that failed to map, which is
+            rebuilt even though it is newer than the source
+
+    Returns:
+        int: the mtime of the index, or None if another process is building
+        it and wait is False
+    """
+    with open(path + ".lock", "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return None
+
+        mtime = _current_mtime(source, path)
+        if mtime is None or mtime == rejected:
+            build_index(source, path)
+            mtime = os.stat(path).st_mtime_ns
+        return mtime
+
+
+def get_catalog():
+    """
+    Returns this process's catalog, mapping the index on first use.
+
+    The index is (re)built from RESTAURANT_CATALOG_SOURCE if it is missing or
+    older than the source, and remapped whenever the file changes, whether
+    this process or another one rebuilt it. Only one process builds at a time.
+    Processes that already have an index mapped keep serving it meanwhile, and
+    the others wait for the build instead of repeating it.
+    """
+    global _catalog, _catalog_mtime
+
+    if not _lock.acquire(blocking=_catalog is None):
+        # Another thread is checking or rebuilding the index
+        return _catalog
+
+    try:
+        source = settings.RESTAURANT_CATALOG_SOURCE
+        path = settings.RESTAURANT_CATALOG_INDEX
+        mtime = _current_mtime(source, path)
+        if mtime is None:
+            mtime = _build(source, path, wait=_catalog is None)
+            if mtime is None:
+                return _catalog
+
+        if _catalog is None or mtime != _catalog_mtime:
+            try:
+                catalog = Catalog(path)
+            except ValueError:
+                # Left behind by an older version of the index format
+                mtime = _build(source, path, wait=True, rejected=mtime)
+                catalog = Catalog(path)
+            _catalog, _catalog_mtime = catalog, mtime
+    finally:
+        _lock.release()
+
+    return _catalog
@@ -0,0 +1,124 @@
+import csv
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from api.renderers import ORJSONRenderer
+from .models import Member, RestaurantSuggestion, Session
+
+CHUNK_SIZE = 2000
+
+EXPORTS = {
+    "sessions": (
+        Session,
+        "date_created",
+        (
+            "id",
+            "join_code",
+            "date_created",
+            "stage",
+            "creator_id",
+            "latitude",
+            "longitude",
+        ),
+    ),
+    "members": (
+        Member,
+        "session__date_created",
+        ("id", "session_id", "user_id", "joined_at"),
+    ),
+    "suggestions": (
+        RestaurantSuggestion,
+        "session__date_created",
+        ("id", "session_id", "name", "is_banned", "picks", "votes"),
+    ),
+}
+FORMATS = ("ndjson", "csv")
+
+# Spreadsheets run CSV cells starting with these as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def parse_bound(value):
+    """
+    Parses an ISO 8601 date or datetime into an aware datetime. Dates mean
+    the start of that day.
+
+    Args:
+        value (str): the date or datetime, or None
+
+    Returns:
+        datetime: the parsed bound, or None if value is empty
+    """
+    if not value:
+        return None
+
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"{value} is not a date or datetime.")
+        parsed = datetime.combine(date, time.min)
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def export_rows(model, since=None, until=None):
+    """
+    Yields the rows of an export one at a time, reading the table in chunks
+    of CHUNK_SIZE so memory use doesn't grow with the history.
+
+    Args:
+        model (str): one of the keys of EXPORTS
+        since (datetime): only sessions created at or after this
+        until (datetime): only sessions created before this
+    """
+    model_class, date_field, fields = EXPORTS[model]
+    queryset = model_class.objects.order_by("pk")
+    if since is not None:
+        queryset = queryset.filter(**{f"{date_field}__gte": since})
+    if until is not None:
+        queryset = queryset.filter(**{f"{date_field}__lt": until})
+
+    # values() skips building model instances for every row
+    return queryset.values(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def escape_formula(value):
+    """Prefixes a string that a spreadsheet would run as a formula with a quote"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """A file-like object whose write returns the data instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def encode(model, rows, output):
+    """
+    Yields an export as chunks of bytes.
+
+    Args:
+        model (str): one of the keys of EXPORTS
+        rows (iterable): the rows yielded by export_rows
+        output (str): one of FORMATS
+    """
+    if output == "csv":
+        fields = EXPORTS[model][2]
+        writer = csv.DictWriter(_Echo(), fieldnames=fields)
+        yield writer.writeheader().encode()
+        for row in rows:
+            yield writer.writerow(
+                {field: escape_formula(value) for field, value in row.items()}
+            ).encode()
+    else:
+        renderer = ORJSONRenderer()
+        for row in rows:
+            yield renderer.render(row) + b"\n"
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from session.catalog import Catalog, build_index
+
+
+class Command(BaseCommand):
+    help = "Compiles the restaurant catalog into its memory mapped index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            default=settings.RESTAURANT_CATALOG_SOURCE,
+            help="CSV or NDJSON catalog to compile",
+        )
+        parser.add_argument(
+            "--output",
+            default=settings.RESTAURANT_CATALOG_INDEX,
+            help="Where to write the index",
+        )
+
+    def handle(self, *args, **options):
+        build_index(options["source"], options["output"])
+        catalog = Catalog(options["output"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {len(catalog)} restaurants into {options['output']}"
+            )
+        )
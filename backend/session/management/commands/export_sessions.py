@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from session.export import EXPORTS, FORMATS, encode, export_rows, parse_bound
+
+
+class Command(BaseCommand):
+    help = "Streams session history as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", choices=EXPORTS, default="sessions")
+        parser.add_argument("--format", choices=FORMATS, default="ndjson")
+        parser.add_argument(
+            "--since", help="Only sessions created on or after this date"
+        )
+        parser.add_argument("--until", help="Only sessions created before this date")
+        parser.add_argument(
+            "--output", help="File to write the export to, instead of stdout"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_bound(options["since"])
+            until = parse_bound(options["until"])
+        except ValueError as e:
+            raise CommandError(e)
+
+        rows = export_rows(options["model"], since, until)
+        chunks = encode(options["model"], rows, options["format"])
+
+        if options["output"]:
+            with open(options["output"], "wb") as f:
+                f.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending="")
+            self.stdout.flush()
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='session',
+            name='stage',
+            field=models.CharField(choices=[('0', 'Lobby'), ('1', 'Suggesting'), ('2', 'Banning'), ('3', 'Voting'), ('4', 'Results')], max_length=1),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remove_duplicate_members(apps, schema_editor):
+    """Keeps only the earliest membership of each user in each session"""
+    Member = apps.get_model('session', 'Member')
+    seen = set()
+    duplicates = []
+    for pk, session_id, user_id in Member.objects.order_by('pk').values_list(
+        'pk', 'session_id', 'user_id'
+    ).iterator():
+        if (session_id, user_id) in seen:
+            duplicates.append(pk)
+        else:
+            seen.add((session_id, user_id))
+    Member.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session', '0002_session_latitude_session_longitude_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='member',
+            name='session',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='session.session'),
+        ),
+        migrations.AlterField(
+            model_name='member',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='restaurantsuggestion',
+            name='session',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestions', to='session.session'),
+        ),
+        migrations.AlterField(
+            model_name='session',
+            name='creator',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='created_sessions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='restaurantsuggestion',
+            index=models.Index(condition=models.Q(('is_banned', False)), fields=['session'], name='suggestion_unbanned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['creator', '-date_created'], name='session_creator_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['stage'], name='session_stage_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_members, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='member',
+            constraint=models.UniqueConstraint(fields=('session', 'user'), name='unique_session_member'),
+        ),
+    ]
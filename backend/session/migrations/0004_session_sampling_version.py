@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session', '0003_session_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='sampling_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
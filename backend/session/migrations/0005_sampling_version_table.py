@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session', '0004_session_sampling_version'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='session',
+            name='sampling_version',
+        ),
+        migrations.CreateModel(
+            name='SamplingVersion',
+            fields=[
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sampling_version', serialize=False, to='session.session')),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -5,6 +5,47 @@ from .utils import generate_code
 User = get_user_model()
 
 
+class SessionQuerySet(models.QuerySet):
+    def with_details(self):
+        """
+        Loads the sessions' creators, members (with their users) and
+        suggestions in a constant number of queries, however many sessions,
+        members and suggestions there are.
+        """
+        return self.select_related("creator").prefetch_related(
+            models.Prefetch("members", queryset=Member.objects.select_related("user")),
+            "suggestions",
+        )
+
+    def with_membership(self, user):
+        """
+        Annotates each session with is_member: whether the user created or
+        joined it.
+
+        Args:
+            user (CustomUser): the user to check
+        """
+        joined = Member.objects.filter(session=models.OuterRef("pk"), user=user)
+        return self.annotate(
+            is_member=models.Q(creator=user) | models.Exists(joined)
+        )
+
+    def joined_by(self, user):
+        """
+        Returns the sessions the user created or joined.
+
+        Args:
+            user (CustomUser): the user whose sessions to return
+        """
+        return self.with_membership(user).filter(is_member=True)
+
+
+class RestaurantSuggestionQuerySet(models.QuerySet):
+    def unbanned(self):
+        """Returns the suggestions that haven't been banned"""
+        return self.filter(is_banned=False)
+
+
 class Session(models.Model):
     """
     Sessions in this app are represented by this model
@@ -22,14 +63,26 @@ class Session(models.Model):
 
     join_code = models.CharField(max_length=6, unique=True, blank=True)
     date_created = models.DateTimeField(auto_now_add=True)
-    creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name="session")
+    creator = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="created_sessions"
+    )
     stage = models.CharField(max_length=1, choices=STAGE_CHOICES)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+
+    objects = SessionQuerySet.as_manager()
 
     REQUIRED_FIELDS = ["creator"]
 
     class Meta:
         verbose_name = "session"
         verbose_name_plural = "sessions"
+        indexes = [
+            models.Index(
+                fields=["creator", "-date_created"], name="session_creator_date_idx"
+            ),
+            models.Index(fields=["stage"], name="session_stage_idx"),
+        ]
 
     def generate_unique_code(self):
         """Uses the generate_code function to generate a unique code"""
@@ -54,18 +107,27 @@ class RestaurantSuggestion(models.Model):
     """
 
     session = models.ForeignKey(
-        Session, on_delete=models.CASCADE, related_name="session"
+        Session, on_delete=models.CASCADE, related_name="suggestions"
     )
     name = models.CharField(max_length=100)
     is_banned = models.BooleanField(default=False)
     picks = models.IntegerField(default=0)
     votes = models.IntegerField(default=0)
 
+    objects = RestaurantSuggestionQuerySet.as_manager()
+
     REQUIRED_FIELDS = ["session", "name"]
 
     class Meta:
         verbose_name = "restaurant"
         verbose_name_plural = "restaurants"
+        indexes = [
+            models.Index(
+                fields=["session"],
+                condition=models.Q(is_banned=False),
+                name="suggestion_unbanned_idx",
+            ),
+        ]
 
     def __str__(self):
         """Returns the restaurant's name"""
@@ -79,8 +141,37 @@ class Member(models.Model):
     The user the member represents and the session the member is in are required.
     """
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    session = models.ForeignKey(Session, on_delete=models.CASCADE)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="memberships"
+    )
+    session = models.ForeignKey(
+        Session, on_delete=models.CASCADE, related_name="members"
+    )
     joined_at = models.DateTimeField(auto_now_add=True)
 
     REQUIRED_FIELDS = ["user", "session"]
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["session", "user"], name="unique_session_member"
+            ),
+        ]
+
+
+class SamplingVersion(models.Model):
+    """
+    The version of a session's alias table, see session.sampling
+
+    Bumped in the database whenever the session's picks or bans change, so
+    every worker can tell its cached table is stale. Kept out of Session so
+    that saving a session never writes back an old version.
+    """
+
+    session = models.OneToOneField(
+        Session,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="sampling_version",
+    )
+    version = models.PositiveIntegerField(default=0)
@@ -0,0 +1,365 @@
+import fcntl
+import heapq
+import json
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from collections import defaultdict
+from itertools import combinations
+
+from django.conf import settings
+
+from .catalog import normalize
+from .sampling import break_tie
+
+MAGIC = b"RCRECOMM"
+VERSION = 1
+
+# magic, version, then the number of names, affinities, co-occurrences and
+# sessions, and the length of the names blob
+HEADER = struct.Struct("<8sIIQQQQ")
+
+# How much a restaurant is worth to the members of a finished session
+SUGGESTED_WEIGHT = 1.0
+VOTE_WEIGHT = 1.0
+WINNER_WEIGHT = 3.0
+
+# How much of a restaurant's score spreads to the restaurants it is usually
+# suggested alongside
+CO_OCCURRENCE_WEIGHT = 0.5
+
+# Finished sessions are appended to a journal, which is folded into the
+# snapshot once it holds this many sessions
+COMPACT_EVERY = 500
+
+
+class Recommender:
+    """
+    Recommends restaurants from the outcomes of finished sessions.
+
+    Keeps a sparse user x restaurant affinity matrix and a restaurant
+    co-occurrence matrix as dicts of dicts. Each finished session is folded
+    in as it happens rather than recomputing from the whole history.
+
+    On disk the matrices are a binary snapshot of coordinate arrays plus an
+    append-only journal of the sessions recorded since. Writes hold an
+    exclusive file lock, and each process replays whatever the others have
+    appended before reading or writing.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.journal_path = self.path + ".journal"
+        self.lock_path = self.path + ".lock"
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.ids = {}
+        self.names = []
+        self.affinity = defaultdict(lambda: defaultdict(float))
+        self.co_occurrence = defaultdict(lambda: defaultdict(float))
+        self.co_occurrence_totals = defaultdict(float)
+        self.popularity = defaultdict(float)
+        self.sessions = set()
+        self._snapshot_mtime = None
+        self._journal_offset = 0
+        self._journal_sessions = 0
+
+    def _restaurant_id(self, name):
+        """Returns the id of a restaurant name, adding it if it's new"""
+        key = normalize(name)
+        restaurant_id = self.ids.get(key)
+        if restaurant_id is None:
+            restaurant_id = self.ids[key] = len(self.names)
+            self.names.append(name)
+        return restaurant_id
+
+    def _add_affinity(self, user_id, restaurant_id, weight):
+        self.affinity[user_id][restaurant_id] += weight
+        self.popularity[restaurant_id] += weight
+
+    def _add_co_occurrence(self, a, b, weight):
+        self.co_occurrence[a][b] += weight
+        self.co_occurrence[b][a] += weight
+        self.co_occurrence_totals[a] += weight
+        self.co_occurrence_totals[b] += weight
+
+    def apply(self, session_id, user_ids, suggestions):
+        """
+        Folds one finished session into the matrices.
+
+        Args:
+            session_id (int): the id of the session
+            user_ids (list): the ids of the session's members
+            suggestions (list): (name, weight) pairs of the session's
+                non-banned suggestions
+        """
+        if session_id in self.sessions:
+            return
+        self.sessions.add(session_id)
+
+        weights = defaultdict(float)
+        for name, weight in suggestions:
+            weights[self._restaurant_id(name)] += weight
+
+        for user_id in user_ids:
+            for restaurant_id, weight in weights.items():
+                self._add_affinity(user_id, restaurant_id, weight)
+
+        for a, b in combinations(sorted(weights), 2):
+            self._add_co_occurrence(a, b, 1.0)
+
+    def _load_snapshot(self):
+        """Replaces the matrices with the ones in the snapshot file"""
+        self._reset()
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+                self._snapshot_mtime = os.fstat(f.fileno()).st_mtime_ns
+        except FileNotFoundError:
+            return
+
+        magic, version, *counts = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} snapshot.")
+        n_names, n_affinity, n_co_occurrence, n_sessions, names_length = counts
+
+        position = HEADER.size
+        names = data[position : position + names_length].decode()
+        position += names_length
+        for name in names.split("\0") if n_names else []:
+            self._restaurant_id(name)
+
+        def read(typecode, count):
+            nonlocal position
+            values = array(typecode)
+            values.frombytes(data[position : position + count * values.itemsize])
+            position += count * values.itemsize
+            return values
+
+        users = read("q", n_affinity)
+        items = read("I", n_affinity)
+        for user_id, restaurant_id, weight in zip(
+            users, items, read("f", n_affinity)
+        ):
+            self._add_affinity(user_id, restaurant_id, weight)
+
+        first = read("I", n_co_occurrence)
+        second = read("I", n_co_occurrence)
+        for a, b, weight in zip(first, second, read("f", n_co_occurrence)):
+            self._add_co_occurrence(a, b, weight)
+
+        self.sessions.update(read("q", n_sessions))
+
+    def _save_snapshot(self):
+        """Writes the matrices to the snapshot file and empties the journal"""
+        users, items, affinities = array("q"), array("I"), array("f")
+        for user_id, row in self.affinity.items():
+            for restaurant_id, weight in row.items():
+                users.append(user_id)
+                items.append(restaurant_id)
+                affinities.append(weight)
+
+        # The matrix is symmetric, so only the upper triangle is stored
+        first, second, co_occurrences = array("I"), array("I"), array("f")
+        for a, row in self.co_occurrence.items():
+            for b, weight in row.items():
+                if a < b:
+                    first.append(a)
+                    second.append(b)
+                    co_occurrences.append(weight)
+
+        names = "\0".join(self.names).encode()
+        sessions = array("q", sorted(self.sessions))
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(
+                    HEADER.pack(
+                        MAGIC,
+                        VERSION,
+                        len(self.names),
+                        len(users),
+                        len(first),
+                        len(sessions),
+                        len(names),
+                    )
+                )
+                f.write(names)
+                for values in (
+                    users,
+                    items,
+                    affinities,
+                    first,
+                    second,
+                    co_occurrences,
+                    sessions,
+                ):
+                    f.write(values.tobytes())
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+        open(self.journal_path, "wb").close()
+        self._snapshot_mtime = os.stat(self.path).st_mtime_ns
+        self._journal_offset = 0
+        self._journal_sessions = 0
+
+    def _refresh(self):
+        """Catches up with the snapshot and journal written by other processes"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        if mtime != self._snapshot_mtime:
+            self._load_snapshot()
+
+        try:
+            with open(self.journal_path, "rb") as f:
+                f.seek(self._journal_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    record = json.loads(line)
+                    self.apply(
+                        record["session"], record["users"], record["suggestions"]
+                    )
+                    self._journal_offset += len(line)
+                    self._journal_sessions += 1
+        except FileNotFoundError:
+            pass
+
+    def _file_lock(self, operation):
+        f = open(self.lock_path, "a")
+        fcntl.flock(f, operation)
+        return f
+
+    def record(self, session_id, user_ids, suggestions):
+        """
+        Records a finished session, persisting it to the journal.
+
+        Args:
+            session_id (int): the id of the session
+            user_ids (list): the ids of the session's members
+            suggestions (list): (name, weight) pairs of the session's
+                non-banned suggestions
+        """
+        with self.lock, self._file_lock(fcntl.LOCK_EX):
+            self._refresh()
+            if session_id in self.sessions:
+                return
+
+            line = json.dumps(
+                {
+                    "session": session_id,
+                    "users": list(user_ids),
+                    "suggestions": list(suggestions),
+                }
+            ).encode()
+            with open(self.journal_path, "ab") as f:
+                f.write(line + b"\n")
+            self._journal_offset += len(line) + 1
+            self._journal_sessions += 1
+            self.apply(session_id, user_ids, suggestions)
+
+            if self._journal_sessions >= COMPACT_EVERY:
+                self._save_snapshot()
+
+    def recommend(self, user_ids, limit=10, exclude=()):
+        """
+        Returns the restaurants a group of users is most likely to pick.
+
+        Sums the users' affinities, spreads each score to the restaurants
+        usually suggested alongside it, and falls back to the overall most
+        popular restaurants for users without any history.
+
+        Args:
+            user_ids (list): the ids of the users
+            limit (int): the maximum number of restaurants
+            exclude (iterable): names to leave out
+
+        Returns:
+            list: (name, score) pairs, best first
+        """
+        with self.lock, self._file_lock(fcntl.LOCK_SH):
+            self._refresh()
+
+            scores = defaultdict(float)
+            for user_id in user_ids:
+                for restaurant_id, weight in self.affinity.get(user_id, {}).items():
+                    scores[restaurant_id] += weight
+
+            if scores:
+                expanded = defaultdict(float, scores)
+                for restaurant_id, score in scores.items():
+                    total = self.co_occurrence_totals.get(restaurant_id)
+                    if not total:
+                        continue
+                    share = CO_OCCURRENCE_WEIGHT * score / total
+                    for other, weight in self.co_occurrence[restaurant_id].items():
+                        expanded[other] += share * weight
+                scores = expanded
+            else:
+                scores = self.popularity
+
+            excluded = {self.ids.get(normalize(name)) for name in exclude}
+            best = heapq.nlargest(
+                limit,
+                (item for item in scores.items() if item[0] not in excluded),
+                key=lambda item: item[1],
+            )
+            return [(self.names[restaurant_id], score) for restaurant_id, score in best]
+
+
+_recommender = None
+_recommender_lock = threading.Lock()
+
+
+def get_recommender():
+    """Returns this process's recommender, backed by RECOMMENDER_STATE_PATH"""
+    global _recommender
+
+    if _recommender is None:
+        with _recommender_lock:
+            if _recommender is None:
+                _recommender = Recommender(settings.RECOMMENDER_STATE_PATH)
+
+    return _recommender
+
+
+def session_user_ids(session):
+    """Returns the ids of a session's creator and members"""
+    user_ids = set(session.members.values_list("user_id", flat=True))
+    user_ids.add(session.creator_id)
+    return sorted(user_ids)
+
+
+def record_session(session):
+    """
+    Folds a session that reached Results into the recommender. Every member
+    gains affinity for each non-banned suggestion, weighted by its votes and
+    whether it won.
+
+    Args:
+        session (Session): the finished session
+    """
+    winner = break_tie(session)
+    suggestions = [
+        (
+            name,
+            SUGGESTED_WEIGHT
+            + VOTE_WEIGHT * votes
+            + (WINNER_WEIGHT if pk == winner else 0),
+        )
+        for pk, name, votes in session.suggestions.unbanned().values_list(
+            "id", "name", "votes"
+        )
+    ]
+    get_recommender().record(session.pk, session_user_ids(session), suggestions)
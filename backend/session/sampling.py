@@ -0,0 +1,196 @@
+import random
+import threading
+from collections import OrderedDict
+
+from django.db.models import F
+
+from .models import RestaurantSuggestion, SamplingVersion, Session
+
+
+class AliasTable:
+    """
+    A Vose alias table for O(1) weighted random draws.
+
+    Building the table is O(n). Each draw costs one random index and one
+    random float, regardless of the number of items. If every weight is zero
+    the items are drawn uniformly.
+    """
+
+    def __init__(self, items, weights):
+        """
+        Args:
+            items (list): the items to draw from
+            weights (list): a non-negative weight for each item
+        """
+        if not items:
+            raise ValueError("An alias table needs at least one item.")
+        if len(items) != len(weights):
+            raise ValueError("There must be exactly one weight per item.")
+
+        n = len(items)
+        total = sum(weights)
+        if total <= 0:
+            weights = [1] * n
+            total = n
+
+        scaled = [weight * n / total for weight in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        prob = [1.0] * n
+        alias = list(range(n))
+
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            prob[less] = scaled[less]
+            alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1
+            if scaled[more] < 1:
+                small.append(more)
+            else:
+                large.append(more)
+
+        # Whatever is left over is 1 up to floating point error
+        self.items = list(items)
+        self.prob = prob
+        self.alias = alias
+
+    def __len__(self):
+        return len(self.items)
+
+    def draw(self, rng=random):
+        """
+        Draws one item.
+
+        Args:
+            rng (random.Random): the random number generator to draw with
+
+        Returns:
+            the drawn item
+        """
+        i = rng.randrange(len(self.items))
+        if rng.random() < self.prob[i]:
+            return self.items[i]
+        return self.items[self.alias[i]]
+
+
+class AliasTableCache:
+    """
+    Keeps built alias tables in a bounded per-process LRU.
+
+    Every table is stamped with its session's SamplingVersion, read from the
+    database on each draw. Invalidating a session bumps that version, so
+    every worker rebuilds its table on the next draw instead of serving a
+    stale one.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._tables = OrderedDict()
+
+    def get(self, session_id):
+        """
+        Returns the alias table of the session's non-banned suggestions
+        weighted by picks, building it if needed.
+
+        Args:
+            session_id (int): the id of the session
+
+        Returns:
+            AliasTable: a table of suggestion ids, or None if the session has
+            no non-banned suggestions
+        """
+        session = (
+            Session.objects.filter(pk=session_id)
+            .values_list("pk", "sampling_version__version")
+            .first()
+        )
+        if session is None:
+            return None
+        version = session[1]
+        if version is None:
+            # Created before the table is first cached, so that invalidate()
+            # only ever has to bump an existing row
+            row, _ = SamplingVersion.objects.get_or_create(session_id=session_id)
+            version = row.version
+
+        with self.lock:
+            cached = self._tables.get(session_id)
+            if cached is not None and cached[0] == version:
+                self._tables.move_to_end(session_id)
+                return cached[1]
+
+        rows = list(
+            RestaurantSuggestion.objects.unbanned()
+            .filter(session_id=session_id)
+            .values_list("id", "picks")
+        )
+        table = AliasTable(*zip(*rows)) if rows else None
+
+        with self.lock:
+            self._tables[session_id] = (version, table)
+            self._tables.move_to_end(session_id)
+            if len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+
+        return table
+
+    def invalidate(self, session_id):
+        """Marks the session's alias table as stale in every worker"""
+        SamplingVersion.objects.filter(session_id=session_id).update(
+            version=F("version") + 1
+        )
+        with self.lock:
+            self._tables.pop(session_id, None)
+
+
+alias_tables = AliasTableCache()
+
+
+def spin(session, seed=None):
+    """
+    Spins the wheel: draws one of the session's non-banned suggestions with
+    probability proportional to its picks.
+
+    Args:
+        session (Session): the session to draw from
+        seed: seeds the draw to make it reproducible
+
+    Returns:
+        int: the id of the drawn suggestion, or None if there is nothing to draw
+    """
+    table = alias_tables.get(session.pk)
+    if table is None:
+        return None
+    return table.draw(random.Random(seed) if seed is not None else random)
+
+
+def break_tie(session):
+    """
+    Picks the winner of a session's vote. Ties on votes are broken by a draw
+    weighted by picks, seeded with the session's join code so every client
+    sees the same winner.
+
+    Args:
+        session (Session): the session to pick the winner of
+
+    Returns:
+        int: the id of the winning suggestion, or None if there are no
+        non-banned suggestions
+    """
+    rows = list(
+        session.suggestions.unbanned()
+        .order_by("id")
+        .values_list("id", "picks", "votes")
+    )
+    if not rows:
+        return None
+
+    most_votes = max(votes for _, _, votes in rows)
+    tied = [(pk, picks) for pk, picks, votes in rows if votes == most_votes]
+    if len(tied) == 1:
+        return tied[0][0]
+
+    table = AliasTable(*zip(*tied))
+    return table.draw(random.Random(session.join_code))
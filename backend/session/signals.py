@@ -0,0 +1,68 @@
+import logging
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import RestaurantSuggestion, Session
+from .recommender import record_session
+from .sampling import alias_tables
+
+# QuerySet.update() and bulk_create() don't send these signals, so code that
+# changes picks or bans that way must call alias_tables.invalidate() itself.
+SAMPLING_FIELDS = ("picks", "is_banned")
+
+logger = logging.getLogger(__name__)
+
+
+def sampling_state(suggestion):
+    """Returns the fields of a suggestion that its session's alias table uses"""
+    return tuple(suggestion.__dict__.get(field) for field in SAMPLING_FIELDS)
+
+
+@receiver(post_init, sender=RestaurantSuggestion)
+def remember_sampling_state(sender, instance, **kwargs):
+    """Remembers the loaded picks and ban so saves can tell if they changed"""
+    instance._sampling_state = sampling_state(instance)
+
+
+@receiver(post_save, sender=RestaurantSuggestion)
+def invalidate_on_save(sender, instance, created, **kwargs):
+    """Invalidates the session's alias table when picks or bans change"""
+    state = sampling_state(instance)
+    if created or state != instance._sampling_state:
+        alias_tables.invalidate(instance.session_id)
+    instance._sampling_state = state
+
+
+@receiver(post_delete, sender=RestaurantSuggestion)
+def invalidate_on_delete(sender, instance, **kwargs):
+    """Invalidates the session's alias table when a suggestion is removed"""
+    alias_tables.invalidate(instance.session_id)
+
+
+@receiver(post_init, sender=Session)
+def remember_stage(sender, instance, **kwargs):
+    """Remembers the loaded stage so saves can tell if it changed"""
+    instance._stage = instance.__dict__.get("stage")
+
+
+def record_session_safely(session):
+    """Records a session, logging rather than raising any failure"""
+    try:
+        record_session(session)
+    except Exception:
+        logger.exception("Could not record session %s for recommendations", session.pk)
+
+
+@receiver(post_save, sender=Session)
+def record_finished_session(sender, instance, created, **kwargs):
+    """
+    Feeds sessions that reach Results to the recommender once committed. Saves
+    that leave a session in Results don't record it again.
+    """
+    stage = instance.__dict__.get("stage")
+    if stage == "4" and (created or instance._stage != "4"):
+        transaction.on_commit(partial(record_session_safely, instance))
+    instance._stage = stage
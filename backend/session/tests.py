@@ -1,3 +1,999 @@
-from django.test import TestCase
+import csv
+import fcntl
+import io
+import json
+import math
+import os
+import random
+import tempfile
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.throttling import buckets
+
+from . import catalog, recommender
+from .catalog import SCAN_LIMIT, Catalog, build_index, haversine, normalize
+from .export import escape_formula
+from .models import Member, RestaurantSuggestion, SamplingVersion, Session
+from .recommender import Recommender
+from .sampling import AliasTable, AliasTableCache, alias_tables, break_tie, spin
+
+User = get_user_model()
+
+
+class SessionQuerySetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(
+            email="creator@example.com", display_name="creator", password="password"
+        )
+        cls.session = Session.objects.create(creator=cls.creator, stage="1")
+        cls.users = [
+            User.objects.create_user(
+                email=f"member{i}@example.com",
+                display_name=f"member{i}",
+                password="password",
+            )
+            for i in range(3)
+        ]
+        for user in cls.users:
+            Member.objects.create(session=cls.session, user=user)
+        for i in range(4):
+            RestaurantSuggestion.objects.create(
+                session=cls.session, name=f"Restaurant {i}", is_banned=i == 0
+            )
+
+    def load_details(self):
+        """Loads every session with details and touches all of it"""
+        sessions = list(Session.objects.with_details())
+        for session in sessions:
+            session.creator.display_name
+            [member.user.display_name for member in session.members.all()]
+            [suggestion.name for suggestion in session.suggestions.all()]
+        return sessions
+
+    def test_with_details_query_count(self):
+        with self.assertNumQueries(3):
+            (session,) = self.load_details()
+
+        self.assertEqual(session.creator, self.creator)
+        self.assertEqual(
+            {member.user for member in session.members.all()}, set(self.users)
+        )
+        self.assertEqual(len(session.suggestions.all()), 4)
+
+    def test_with_details_query_count_is_constant(self):
+        other = Session.objects.create(creator=self.users[0], stage="0")
+        for user in [self.creator, *self.users[1:]]:
+            Member.objects.create(session=other, user=user)
+        RestaurantSuggestion.objects.create(session=other, name="Other")
+
+        with self.assertNumQueries(3):
+            sessions = self.load_details()
+        self.assertEqual(len(sessions), 2)
+
+    def test_with_membership(self):
+        outsider = User.objects.create_user(
+            email="outsider@example.com", display_name="outsider", password="password"
+        )
+        for user, expected in [
+            (self.creator, True),
+            (self.users[0], True),
+            (outsider, False),
+        ]:
+            with self.assertNumQueries(1):
+                session = Session.objects.with_membership(user).get(pk=self.session.pk)
+            self.assertIs(session.is_member, expected)
+
+        self.assertEqual(list(Session.objects.joined_by(outsider)), [])
+        self.assertEqual(list(Session.objects.joined_by(self.users[1])), [self.session])
+
+    def test_unbanned_suggestions(self):
+        self.assertEqual(
+            sorted(self.session.suggestions.unbanned().values_list("name", flat=True)),
+            ["Restaurant 1", "Restaurant 2", "Restaurant 3"],
+        )
+
+    def test_related_names(self):
+        self.assertEqual(list(self.creator.created_sessions.all()), [self.session])
+        self.assertEqual(
+            [member.session for member in self.users[0].memberships.all()],
+            [self.session],
+        )
+
+    def test_user_joins_session_once(self):
+        with self.assertRaises(IntegrityError):
+            Member.objects.create(session=self.session, user=self.users[0])
+
+
+class AliasTableTests(SimpleTestCase):
+    def assertDrawsInProportion(self, table, expected, draws=200000):
+        rng = random.Random(0)
+        counts = Counter(table.draw(rng) for _ in range(draws))
+        for item, share in expected.items():
+            self.assertAlmostEqual(counts[item] / draws, share, delta=0.01)
+
+    def test_draw_distribution(self):
+        table = AliasTable(["a", "b", "c", "d"], [1, 2, 7, 0])
+        self.assertDrawsInProportion(table, {"a": 0.1, "b": 0.2, "c": 0.7, "d": 0})
+
+    def test_zero_weights_draw_uniformly(self):
+        table = AliasTable(["a", "b"], [0, 0])
+        self.assertDrawsInProportion(table, {"a": 0.5, "b": 0.5})
+
+    def test_seeded_draws_are_reproducible(self):
+        table = AliasTable(list(range(10)), list(range(1, 11)))
+        first = [table.draw(random.Random(seed)) for seed in range(50)]
+        second = [table.draw(random.Random(seed)) for seed in range(50)]
+        self.assertEqual(first, second)
+
+    def test_needs_items(self):
+        with self.assertRaises(ValueError):
+            AliasTable([], [])
+        with self.assertRaises(ValueError):
+            AliasTable(["a"], [1, 2])
+
+
+class SamplingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(
+            email="creator@example.com", display_name="creator", password="password"
+        )
+
+    def setUp(self):
+        self.session = Session.objects.create(creator=self.creator, stage="1")
+        self.suggestions = [
+            RestaurantSuggestion.objects.create(
+                session=self.session, name=name, picks=picks
+            )
+            for name, picks in [("A", 1), ("B", 3), ("C", 0)]
+        ]
+
+    def version(self):
+        return SamplingVersion.objects.get(session=self.session).version
+
+    def test_spin_distribution(self):
+        counts = Counter(spin(self.session, seed=seed) for seed in range(4000))
+        a, b, c = (suggestion.pk for suggestion in self.suggestions)
+        self.assertEqual(counts[c], 0)
+        self.assertAlmostEqual(counts[b] / 4000, 0.75, delta=0.03)
+
+    def test_seeded_spin_is_reproducible(self):
+        draws = [spin(self.session, seed=seed) for seed in range(20)]
+        self.assertEqual(draws, [spin(self.session, seed=seed) for seed in range(20)])
+
+    def test_spin_skips_banned_suggestions(self):
+        self.suggestions[1].is_banned = True
+        self.suggestions[1].save()
+        draws = {spin(self.session) for _ in range(200)}
+        self.assertEqual(draws, {self.suggestions[0].pk})
+
+    def test_spin_without_suggestions(self):
+        empty = Session.objects.create(creator=self.creator, stage="1")
+        self.assertIsNone(spin(empty))
+
+    def test_break_tie(self):
+        a, b, c = self.suggestions
+        a.votes = b.votes = 2
+        c.votes = 1
+        for suggestion in self.suggestions:
+            suggestion.save()
+
+        winner = break_tie(self.session)
+        self.assertIn(winner, (a.pk, b.pk))
+        self.assertEqual([break_tie(self.session) for _ in range(5)], [winner] * 5)
+
+        c.votes = 3
+        c.save()
+        self.assertEqual(break_tie(self.session), c.pk)
+
+    def test_picks_and_bans_invalidate(self):
+        table = alias_tables.get(self.session.pk)
+        version = self.version()
+
+        self.suggestions[0].picks = 5
+        self.suggestions[0].save()
+        self.assertEqual(self.version(), version + 1)
+        self.assertIsNot(alias_tables.get(self.session.pk), table)
+
+        table = alias_tables.get(self.session.pk)
+        self.suggestions[1].is_banned = True
+        self.suggestions[1].save()
+        self.assertEqual(self.version(), version + 2)
+        self.assertIsNot(alias_tables.get(self.session.pk), table)
+
+    def test_names_and_votes_do_not_invalidate(self):
+        table = alias_tables.get(self.session.pk)
+        version = self.version()
+
+        self.suggestions[0].name = "Renamed"
+        self.suggestions[0].votes = 4
+        self.suggestions[0].save()
+        self.assertEqual(self.version(), version)
+        self.assertIs(alias_tables.get(self.session.pk), table)
+
+    def test_other_workers_see_invalidation(self):
+        worker = AliasTableCache()
+        table = worker.get(self.session.pk)
+        self.assertIs(worker.get(self.session.pk), table)
+
+        # Saved through this process's alias_tables, not worker's
+        self.suggestions[2].picks = 10
+        self.suggestions[2].save()
+        self.assertIsNot(worker.get(self.session.pk), table)
+
+    def test_session_save_keeps_sampling_version(self):
+        alias_tables.get(self.session.pk)
+        stale = Session.objects.get(pk=self.session.pk)
+        alias_tables.invalidate(self.session.pk)
+        stale.stage = "2"
+        stale.save()
+        self.assertEqual(self.version(), 1)
+
+    def test_version_created_on_first_draw(self):
+        self.assertFalse(SamplingVersion.objects.exists())
+        alias_tables.invalidate(self.session.pk)
+        self.assertFalse(SamplingVersion.objects.exists())
+
+        table = alias_tables.get(self.session.pk)
+        self.assertEqual(self.version(), 0)
+        self.assertIs(alias_tables.get(self.session.pk), table)
+
+    def test_session_save_keeps_default_behaviour(self):
+        session = Session.objects.get(pk=self.session.pk)
+        Session.objects.filter(pk=session.pk).delete()
+        session.save()
+        self.assertTrue(Session.objects.filter(pk=session.pk).exists())
+
+        session.stage = "2"
+        session.save(update_fields=["stage"])
+        with self.assertRaises(IntegrityError):
+            session.save(force_insert=True)
+
+    def test_deleting_a_session_deletes_its_version(self):
+        alias_tables.get(self.session.pk)
+        self.session.delete()
+        self.assertFalse(SamplingVersion.objects.exists())
+        self.assertIsNone(alias_tables.get(self.session.pk))
+
+
+def write_catalog(path, rows):
+    """Writes (name, popularity, latitude, longitude) rows as a catalog CSV"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "popularity", "latitude", "longitude"])
+        writer.writerows(rows)
+
+
+def use_temporary_catalog(test, rows):
+    """
+    Points the catalog settings at a temporary directory holding a catalog of
+    rows for the rest of a test
+
+    Returns:
+        tuple: the paths of the source and of the (not yet built) index
+    """
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    source = os.path.join(directory.name, "catalog.csv")
+    index = os.path.join(directory.name, "catalog.idx")
+    write_catalog(source, rows)
+
+    settings = override_settings(
+        RESTAURANT_CATALOG_SOURCE=source, RESTAURANT_CATALOG_INDEX=index
+    )
+    settings.enable()
+    test.addCleanup(settings.disable)
+    catalog._catalog = None
+    test.addCleanup(setattr, catalog, "_catalog", None)
+    return source, index
+
+
+# (latitude, longitude) of the points half of the generated entries are
+# clustered around: a city, both sides of the dateline and both poles
+CLUSTERS = [(-33.87, 151.21), (0.0, 179.99), (0.0, -179.99), (89.99, 0.0), (-89.99, 0.0)]
+
+
+def generate_location(rng):
+    if rng.random() < 0.5:
+        return rng.uniform(-90, 90), rng.uniform(-180, 180)
+    latitude, longitude = rng.choice(CLUSTERS)
+    latitude = rng.gauss(latitude, 0.05)
+    # Past a pole is the other side of it, rather than piling up on it
+    if abs(latitude) > 90:
+        latitude, longitude = math.copysign(180, latitude) - latitude, longitude + 180
+    return latitude, (rng.gauss(longitude, 0.05) + 180) % 360 - 180
+
+
+class CatalogTestCase(SimpleTestCase):
+    """Builds a generated catalog in a temporary directory"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.source = os.path.join(cls.directory.name, "catalog.csv")
+        cls.index = os.path.join(cls.directory.name, "catalog.idx")
+
+        rng = random.Random(0)
+        popularity = rng.sample(range(100000), 3000)
+        cls.rows = [
+            (
+                "".join(rng.choice("abc é") for _ in range(rng.randint(1, 8))).strip()
+                or "a",
+                popularity[i],
+                *generate_location(rng),
+            )
+            for i in range(3000)
+        ]
+        write_catalog(cls.source, cls.rows)
+        build_index(cls.source, cls.index)
+        cls.catalog = Catalog(cls.index)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+
+class AutocompleteTests(CatalogTestCase):
+    def brute_force(self, query, limit):
+        prefix = normalize(query)
+        return sorted(
+            (popularity for name, popularity, _, _ in self.rows
+             if normalize(name).startswith(prefix)),
+            reverse=True,
+        )[:limit]
+
+    def assertMatchesBruteForce(self, query, limit=10):
+        results = self.catalog.autocomplete(query, limit)
+        self.assertEqual(
+            [entry["popularity"] for entry in results],
+            self.brute_force(query, limit),
+        )
+        for entry in results:
+            self.assertTrue(normalize(entry["name"]).startswith(normalize(query)))
+
+    def matches(self, query):
+        prefix = normalize(query)
+        return sum(normalize(name).startswith(prefix) for name, *_ in self.rows)
+
+    def test_precomputed_prefixes(self):
+        for query in ("a", "B", "c ", "é"):
+            with self.subTest(query=query):
+                self.assertGreater(self.matches(query), SCAN_LIMIT)
+                self.assertMatchesBruteForce(query)
+                self.assertMatchesBruteForce(query, limit=3)
+
+    def test_scanned_prefixes(self):
+        for query in ("abc", "cab a", "bba", "a éc", "aaaa"):
+            with self.subTest(query=query):
+                self.assertLessEqual(self.matches(query), SCAN_LIMIT)
+                self.assertMatchesBruteForce(query)
+
+    def test_every_prefix(self):
+        prefixes = {normalize(name)[:n] for name, *_ in self.rows for n in (1, 2, 3)}
+        for query in prefixes:
+            self.assertMatchesBruteForce(query.strip() or "a")
+
+    def test_no_matches(self):
+        self.assertEqual(self.catalog.autocomplete("zzz"), [])
+        self.assertEqual(self.catalog.autocomplete("   "), [])
+        self.assertEqual(self.catalog.autocomplete("a", limit=0), [])
+
+    def test_entries(self):
+        self.assertEqual(len(self.catalog), len(self.rows))
+        self.assertCountEqual(
+            [
+                (entry["name"], entry["popularity"])
+                for entry in map(self.catalog.entry, range(len(self.catalog)))
+            ],
+            [(name, popularity) for name, popularity, *_ in self.rows],
+        )
+
+
+class NearbyTests(CatalogTestCase):
+    def brute_force(self, latitude, longitude, radius, limit):
+        """Returns the (id, distance) of the closest rows, by checking all of them"""
+        found = sorted(
+            (haversine(latitude, longitude, lat, lon), id)
+            for id, (_, _, lat, lon) in enumerate(self.rows)
+        )
+        return [(id, distance) for distance, id in found if distance <= radius][:limit]
+
+    def assertMatchesBruteForce(self, latitude, longitude, radius, limit=10):
+        results = self.catalog.nearby(latitude, longitude, radius, limit)
+        expected = self.brute_force(latitude, longitude, radius, limit)
+        self.assertEqual([entry["id"] for entry in results], [id for id, _ in expected])
+        for entry, (_, distance) in zip(results, expected):
+            self.assertAlmostEqual(entry["distance"], distance)
+
+    def test_random_points(self):
+        rng = random.Random(1)
+        for _ in range(50):
+            point = generate_location(rng)
+            for radius in (0.5, 5, 50, 500):
+                with self.subTest(point=point, radius=radius):
+                    self.assertMatchesBruteForce(*point, radius)
+
+    def test_dateline(self):
+        for longitude in (-180, -179.999, 179.999, 180):
+            for radius in (1, 5, 20):
+                with self.subTest(longitude=longitude, radius=radius):
+                    self.assertMatchesBruteForce(0.0, longitude, radius, limit=50)
+
+    def test_poles(self):
+        for latitude in (-90, -89.99, 89.99, 90):
+            for longitude in (-180, 0, 123.4):
+                with self.subTest(latitude=latitude, longitude=longitude):
+                    self.assertMatchesBruteForce(latitude, longitude, 10, limit=50)
+
+    def test_limits(self):
+        self.assertEqual(self.catalog.nearby(-33.87, 151.21, 0), [])
+        self.assertEqual(self.catalog.nearby(-33.87, 151.21, 5, limit=0), [])
+        self.assertMatchesBruteForce(-33.87, 151.21, 1000, limit=1)
+
+    def test_find(self):
+        for id in (0, 1, len(self.rows) - 1):
+            i = self.catalog.find(id)
+            self.assertEqual(self.catalog.entry(i)["id"], id)
+            self.assertEqual(self.catalog.entry(i)["name"], self.rows[id][0])
+        self.assertIsNone(self.catalog.find(len(self.rows)))
+        self.assertIsNone(self.catalog.find(-1))
+
+
+class CatalogIndexFileTests(SimpleTestCase):
+    def setUp(self):
+        self.source, self.index = use_temporary_catalog(
+            self, [("Pizza Palace", 10, "", "")]
+        )
+        self.directory = os.path.dirname(self.source)
+
+    def names(self):
+        return [entry["name"] for entry in catalog.get_catalog().autocomplete("p")]
+
+    def test_builds_missing_index(self):
+        self.assertEqual(self.names(), ["Pizza Palace"])
+        self.assertTrue(os.path.exists(self.index))
+
+    def test_rebuilds_index_older_than_source(self):
+        build_index(self.source, self.index)
+        write_catalog(self.source, [("Pho Saigon", 10, "", "")])
+        os.utime(self.index, (0, 0))
+
+        self.assertEqual(self.names(), ["Pho Saigon"])
+
+    def test_rebuilds_index_in_an_old_format(self):
+        with open(self.index, "wb") as f:
+            f.write(
+                catalog.HEADER.pack(
+                    catalog.MAGIC, 1, 0, *[0] * 2 * len(catalog.SECTIONS)
+                )
+            )
+
+        self.assertEqual(self.names(), ["Pizza Palace"])
+
+    def hold_build_lock(self):
+        """Takes the lock a process building the index holds"""
+        lock = open(self.index + ".lock", "a")
+        self.addCleanup(lock.close)
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def test_serves_mapped_index_while_another_process_builds(self):
+        first = catalog.get_catalog()
+        write_catalog(self.source, [("Pho Saigon", 10, "", "")])
+        os.utime(self.index, (0, 0))
+
+        lock = self.hold_build_lock()
+        with mock.patch.object(catalog, "build_index") as build_index:
+            self.assertIs(catalog.get_catalog(), first)
+        build_index.assert_not_called()
+
+        lock.close()
+        self.assertEqual(self.names(), ["Pho Saigon"])
+
+    def test_does_not_repeat_a_build_done_while_waiting(self):
+        build_index(self.source, self.index)
+        with mock.patch.object(catalog, "build_index") as build_index_mock:
+            mtime = catalog._build(self.source, self.index, wait=True)
+        build_index_mock.assert_not_called()
+        self.assertEqual(mtime, os.stat(self.index).st_mtime_ns)
+
+        self.hold_build_lock()
+        self.assertIsNone(catalog._build(self.source, self.index, wait=False))
+
+    def test_remaps_index_rebuilt_elsewhere(self):
+        first = catalog.get_catalog()
+        self.assertIs(catalog.get_catalog(), first)
+
+        source = os.path.join(self.directory, "other.csv")
+        write_catalog(source, [("Pho Saigon", 10, "", "")])
+        build_index(source, self.index)
+        os.utime(self.index, ns=(0, os.stat(self.source).st_mtime_ns + 1))
+
+        self.assertIsNot(catalog.get_catalog(), first)
+        self.assertEqual(self.names(), ["Pho Saigon"])
+
+    def test_ids_are_kept_across_rebuilds(self):
+        with open(self.source, "w", encoding="utf-8") as f:
+            f.write("id,name\n7,Pizza Palace\n3,Pasta Place\n")
+        build_index(self.source, self.index)
+        ids = {e["name"]: e["id"] for e in Catalog(self.index).autocomplete("p")}
+        self.assertEqual(ids, {"Pizza Palace": 7, "Pasta Place": 3})
+
+        with open(self.source, "w", encoding="utf-8") as f:
+            f.write("id,name\n1,Apple Pie\n3,Pasta Place\n7,Pizza Palace\n")
+        build_index(self.source, self.index)
+        rebuilt = Catalog(self.index)
+        for name, id in ids.items():
+            self.assertEqual(rebuilt.entry(rebuilt.find(id))["name"], name)
+
+    def test_duplicate_ids(self):
+        with open(self.source, "w", encoding="utf-8") as f:
+            f.write("id,name\n1,Pizza Palace\n1,Pasta Place\n")
+        with self.assertRaises(ValueError):
+            build_index(self.source, self.index)
+
+    def test_ids_out_of_range(self):
+        for id in ("-3", "5000000000", "1.5", "seven"):
+            with self.subTest(id=id):
+                with open(self.source, "w", encoding="utf-8") as f:
+                    f.write(f"id,name\n1,Pizza Palace\n{id},Pasta Place\n")
+                with self.assertRaisesMessage(ValueError, "Row 2 of"):
+                    build_index(self.source, self.index)
+
+    def test_ndjson_source(self):
+        source = os.path.join(self.directory, "catalog.ndjson")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write('{"name": "Poke Paradise", "popularity": 3}\n\n')
+        build_index(source, self.index)
+        self.assertEqual(
+            [entry["name"] for entry in Catalog(self.index).autocomplete("pok")],
+            ["Poke Paradise"],
+        )
+
+
+class CatalogViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="user@example.com", display_name="user", password="password"
+        )
+        cls.outsider = User.objects.create_user(
+            email="outsider@example.com", display_name="outsider", password="password"
+        )
+        cls.session = Session.objects.create(
+            creator=cls.user, stage="0", latitude=-33.87, longitude=151.21
+        )
+
+    def setUp(self):
+        buckets.clear()
+        use_temporary_catalog(
+            self,
+            [
+                ("Taco Fiesta", 5, -33.871, 151.21),
+                ("Tokyo Grill", 9, -33.88, 151.21),
+                ("Thai", 1, "", ""),
+                ("Far Away", 1, -33.87, 152.21),
+            ],
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.nearby = f"/session/{self.session.join_code}/restaurants/nearby"
+        self.suggest = f"/session/{self.session.join_code}/suggestions/nearby"
+
+    def test_autocomplete(self):
+        response = self.client.get("/session/restaurants/autocomplete?q=t&limit=2")
+        self.assertEqual(
+            [entry["name"] for entry in response.json()["results"]],
+            ["Tokyo Grill", "Taco Fiesta"],
+        )
+
+    def test_bad_limit(self):
+        response = self.client.get("/session/restaurants/autocomplete?q=t&limit=x")
+        self.assertIn("error", response.json())
+
+    def test_requires_login(self):
+        response = APIClient().get("/session/restaurants/autocomplete?q=t")
+        self.assertEqual(response.status_code, 403)
+
+    def test_nearby(self):
+        response = self.client.get(self.nearby)
+        self.assertEqual(
+            [(entry["id"], entry["name"]) for entry in response.json()["results"]],
+            [(0, "Taco Fiesta"), (1, "Tokyo Grill")],
+        )
+
+        response = self.client.get(self.nearby, {"radius": 200, "limit": 1})
+        self.assertEqual(len(response.json()["results"]), 1)
+        response = self.client.get(
+            self.nearby, {"latitude": -33.87, "longitude": 152.2, "radius": 5}
+        )
+        self.assertEqual(
+            [entry["name"] for entry in response.json()["results"]], ["Far Away"]
+        )
+
+    def test_nearby_rejects_bad_parameters(self):
+        for params in [
+            {"radius": "nan"},
+            {"radius": "inf"},
+            {"latitude": "nan"},
+            {"longitude": "-inf"},
+            {"latitude": 91},
+            {"limit": "x"},
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(self.nearby, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("error", response.json())
+
+    def test_nearby_needs_membership(self):
+        self.client.force_authenticate(self.outsider)
+        self.assertIn("error", self.client.get(self.nearby).json())
+        response = self.client.post(self.suggest, {"ids": [0]}, format="json")
+        self.assertIn("error", response.json())
+
+    def test_suggest_nearby(self):
+        response = self.client.post(self.suggest, {"ids": [1, 0, "1"]}, format="json")
+        self.assertEqual(
+            [s["name"] for s in response.json()["suggestions"]],
+            ["Taco Fiesta", "Tokyo Grill"],
+        )
+
+        response = self.client.post(self.suggest, {"ids": [0, 3]}, format="json")
+        self.assertEqual(
+            [s["name"] for s in response.json()["suggestions"]], ["Far Away"]
+        )
+        self.assertEqual(self.session.suggestions.count(), 3)
+
+    def test_suggest_nearby_rejects_bad_ids(self):
+        for ids in ["12", 12, None, {"0": 1}, ["x"], [4], [-1]]:
+            with self.subTest(ids=ids):
+                response = self.client.post(self.suggest, {"ids": ids}, format="json")
+                self.assertIn("error", response.json())
+        response = self.client.post(self.suggest, {}, format="json")
+        self.assertIn("error", response.json())
+        self.assertFalse(self.session.suggestions.exists())
+
+
+class RecommenderTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "recommender.bin")
+
+    def names(self, instance, user_ids, **kwargs):
+        return [name for name, _ in instance.recommend(user_ids, **kwargs)]
+
+    def test_journal_is_replayed_by_other_instances(self):
+        first, second = Recommender(self.path), Recommender(self.path)
+        first.record(1, [1, 2], [("Pizza Palace", 2.0), ("Sushi Train", 1.0)])
+
+        self.assertEqual(
+            second.recommend([1]), [("Pizza Palace", 2.5), ("Sushi Train", 2.0)]
+        )
+        self.assertFalse(os.path.exists(self.path))
+
+        second.record(2, [3], [("Taco Fiesta", 1.0)])
+        self.assertEqual(self.names(first, [3]), ["Taco Fiesta"])
+
+    def test_sessions_are_only_recorded_once(self):
+        first, second = Recommender(self.path), Recommender(self.path)
+        first.record(1, [1], [("Pizza Palace", 2.0)])
+        first.record(1, [1], [("Pizza Palace", 2.0)])
+        second.record(1, [1], [("Pizza Palace", 2.0)])
+
+        self.assertEqual(second.recommend([1]), [("Pizza Palace", 2.0)])
+        with open(first.journal_path, "rb") as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_journal_is_compacted(self):
+        first, second = Recommender(self.path), Recommender(self.path)
+        with mock.patch("session.recommender.COMPACT_EVERY", 3):
+            for session_id in range(3):
+                first.record(
+                    session_id,
+                    [session_id],
+                    [("Pizza Palace", 1.0), (f"Restaurant {session_id}", 0.5)],
+                )
+            self.assertEqual(os.path.getsize(first.journal_path), 0)
+            self.assertTrue(os.path.exists(self.path))
+
+            second.record(3, [3], [("Sushi Train", 4.0)])
+            second.record(0, [0], [("Sushi Train", 4.0)])
+
+        loaded = Recommender(self.path)
+        for instance in (first, second, loaded):
+            self.assertEqual(
+                instance.recommend([0, 1], limit=3),
+                second.recommend([0, 1], limit=3),
+            )
+            self.assertEqual(instance.sessions, {0, 1, 2, 3})
+            self.assertEqual(
+                self.names(instance, [404], limit=2),
+                ["Sushi Train", "Pizza Palace"],
+            )
+
+    def test_co_occurrence(self):
+        instance = Recommender(self.path)
+        instance.record(1, [1], [("Pizza Palace", 1.0)])
+        instance.record(2, [2], [("Pizza Palace", 1.0), ("Sushi Train", 1.0)])
+
+        self.assertEqual(
+            instance.recommend([1]), [("Pizza Palace", 1.0), ("Sushi Train", 0.5)]
+        )
+
+    def test_exclude_and_popularity_fallback(self):
+        instance = Recommender(self.path)
+        self.assertEqual(instance.recommend([1]), [])
+
+        instance.record(1, [1], [("Pizza Palace", 3.0), ("Sushi Train", 1.0)])
+        instance.record(2, [2], [("Taco Fiesta", 2.0)])
+
+        self.assertEqual(
+            self.names(instance, [3]), ["Pizza Palace", "Taco Fiesta", "Sushi Train"]
+        )
+        self.assertEqual(
+            self.names(instance, [3], exclude=["pizza  PALACE", "Unknown"]),
+            ["Taco Fiesta", "Sushi Train"],
+        )
+        self.assertEqual(
+            self.names(instance, [1], exclude=["Pizza Palace"]), ["Sushi Train"]
+        )
+
+    def test_old_snapshot_format(self):
+        with open(self.path, "wb") as f:
+            f.write(recommender.HEADER.pack(recommender.MAGIC, 0, 0, 0, 0, 0, 0))
+        with self.assertRaises(ValueError):
+            Recommender(self.path).recommend([1])
+
+
+class RecordSessionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="user@example.com", display_name="user", password="password"
+        )
+        cls.member = User.objects.create_user(
+            email="member@example.com", display_name="member", password="password"
+        )
+
+    def setUp(self):
+        buckets.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            RECOMMENDER_STATE_PATH=os.path.join(directory.name, "recommender.bin")
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        recommender._recommender = None
+        self.addCleanup(setattr, recommender, "_recommender", None)
+
+        self.session = Session.objects.create(creator=self.user, stage="3")
+        Member.objects.create(session=self.session, user=self.member)
+        RestaurantSuggestion.objects.create(
+            session=self.session, name="Pizza Palace", votes=2
+        )
+        RestaurantSuggestion.objects.create(
+            session=self.session, name="Banned Burgers", is_banned=True
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/session/{self.session.join_code}/suggestions/recommended"
+
+    def finish(self, session):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            session.stage = "4"
+            session.save()
+        return callbacks
+
+    def names(self, recommendations):
+        return [name for name, _ in recommendations]
+
+    def test_records_sessions_reaching_results(self):
+        self.assertEqual(len(self.finish(self.session)), 1)
+
+        state = recommender.get_recommender()
+        self.assertEqual(state.sessions, {self.session.pk})
+        self.assertEqual(
+            self.names(state.recommend([self.member.pk])), ["Pizza Palace"]
+        )
+
+    def test_saves_in_results_are_not_recorded_again(self):
+        self.finish(self.session)
+        self.assertEqual(self.finish(self.session), [])
+        self.assertEqual(self.finish(Session.objects.get(pk=self.session.pk)), [])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Session.objects.create(creator=self.user, stage="4")
+        self.assertEqual(len(callbacks), 1)
+
+    def test_recorder_failures_are_logged(self):
+        with mock.patch(
+            "session.signals.record_session", side_effect=OSError("disk full")
+        ), self.assertLogs("session.signals", "ERROR"):
+            self.finish(self.session)
+        self.assertEqual(Session.objects.get(pk=self.session.pk).stage, "4")
+
+    def test_recommended_suggestions(self):
+        self.finish(self.session)
+        lobby = Session.objects.create(creator=self.member, stage="0")
+        url = f"/session/{lobby.join_code}/suggestions/recommended"
+        self.client.force_authenticate(self.member)
+
+        response = self.client.get(url)
+        self.assertEqual(
+            [r["name"] for r in response.json()["results"]], ["Pizza Palace"]
+        )
+        response = self.client.post(url)
+        self.assertEqual(
+            [s["name"] for s in response.json()["suggestions"]], ["Pizza Palace"]
+        )
+        self.assertEqual(self.client.get(url).json()["results"], [])
+
+    def test_bad_limit(self):
+        for method in (self.client.get, self.client.post):
+            with self.subTest(method=method.__name__):
+                response = method(f"{self.url}?limit=x")
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("error", response.json())
+
+    def test_only_posts_are_throttled(self):
+        for _ in range(61):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertNotEqual(self.client.post(self.url).status_code, 429)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email="staff@example.com",
+            display_name="staff",
+            password="password",
+            is_staff=True,
+        )
+        cls.user = User.objects.create_user(
+            email="user@example.com", display_name="user", password="password"
+        )
+        cls.old = Session.objects.create(creator=cls.user, stage="4")
+        cls.new = Session.objects.create(creator=cls.staff, stage="1")
+        Session.objects.filter(pk=cls.old.pk).update(
+            date_created=datetime(2024, 1, 1, 12, tzinfo=dt_timezone.utc)
+        )
+        Session.objects.filter(pk=cls.new.pk).update(
+            date_created=datetime(2024, 2, 1, 12, tzinfo=dt_timezone.utc)
+        )
+        Member.objects.create(session=cls.old, user=cls.staff)
+        cls.suggestions = [
+            RestaurantSuggestion.objects.create(session=cls.old, name="Pizza, Palace"),
+            RestaurantSuggestion.objects.create(
+                session=cls.new, name="=HYPERLINK(\"http://example.com\")", votes=2
+            ),
+            RestaurantSuggestion.objects.create(session=cls.new, name="-1+1"),
+            RestaurantSuggestion.objects.create(session=cls.new, name="@SUM(A1)"),
+            RestaurantSuggestion.objects.create(session=cls.new, name="\t=1+1"),
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def export(self, accept="*/*", **params):
+        response = self.client.get("/session/export", params, HTTP_ACCEPT=accept)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/session/export").status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get("/session/export").status_code, 403)
+
+    def test_ndjson(self):
+        rows = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual([row["id"] for row in rows], [self.old.pk, self.new.pk])
+        self.assertEqual(rows[0]["join_code"], self.old.join_code)
+        self.assertEqual(rows[0]["date_created"], "2024-01-01T12:00:00Z")
+        self.assertIsNone(rows[0]["latitude"])
+
+    def test_since_and_until(self):
+        def ids(**params):
+            rows = self.export(model="suggestions", **params).splitlines()
+            return [json.loads(row)["id"] for row in rows]
+
+        old, *new = [s.pk for s in self.suggestions]
+        self.assertEqual(ids(since="2024-01-15"), new)
+        self.assertEqual(ids(until="2024-01-15"), [old])
+        self.assertEqual(ids(since="2024-01-01T12:00:00Z", until="2024-02-01"), [old])
+        self.assertEqual(ids(since="2024-03-01"), [])
+
+        response = self.client.get("/session/export", {"since": "yesterday"})
+        self.assertIn("error", response.json())
+
+    def test_csv(self):
+        content = self.export(model="suggestions", output="csv").decode()
+        rows = list(csv.DictReader(io.StringIO(content, newline="")))
+        self.assertEqual(
+            [row["name"] for row in rows],
+            [
+                "Pizza, Palace",
+                "'=HYPERLINK(\"http://example.com\")",
+                "'-1+1",
+                "'@SUM(A1)",
+                "'\t=1+1",
+            ],
+        )
+        self.assertEqual(rows[1]["votes"], "2")
+        self.assertEqual(rows[1]["is_banned"], "False")
+
+    def test_accept_header(self):
+        for accept, output in [
+            ("text/csv", "csv"),
+            ("application/x-ndjson", "ndjson"),
+            ("text/csv", "ndjson"),
+        ]:
+            with self.subTest(accept=accept, output=output):
+                content = self.export(accept=accept, output=output)
+                self.assertEqual(content.startswith(b"id,"), output == "csv")
+
+        response = self.client.get(
+            "/session/export", {"output": "xml"}, HTTP_ACCEPT="text/csv"
+        )
+        self.assertIn("error", response.json())
+        self.client.force_authenticate(self.user)
+        response = self.client.get("/session/export", HTTP_ACCEPT="text/csv")
+        self.assertEqual(response.status_code, 403)
+
+    def test_escape_formula(self):
+        for value in ("=1", "+1", "-1", "@A1", "\t=1", "\r=1"):
+            self.assertEqual(escape_formula(value), "'" + value)
+        for value in ("Pizza", "", " =1", -1, None):
+            self.assertEqual(escape_formula(value), value)
+
+    def test_bad_parameters(self):
+        for params in [{"model": "users"}, {"output": "xml"}]:
+            with self.subTest(params=params):
+                response = self.client.get("/session/export", params)
+                self.assertIn("error", response.json())
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "members.csv")
+            call_command(
+                "export_sessions",
+                model="members",
+                format="csv",
+                since="2024-01-01",
+                output=path,
+            )
+            with open(path, newline="") as f:
+                rows = list(csv.DictReader(f))
+
+        self.assertEqual(
+            [(row["session_id"], row["user_id"]) for row in rows],
+            [(str(self.old.pk), str(self.staff.pk))],
+        )
+
+    def test_command_to_stdout(self):
+        stdout = io.StringIO()
+        call_command("export_sessions", until="2024-01-15", stdout=stdout)
+        self.assertEqual(
+            [json.loads(line)["id"] for line in stdout.getvalue().splitlines()],
+            [self.old.pk],
+        )
+
+    def test_command_bad_date(self):
+        with self.assertRaises(CommandError):
+            call_command("export_sessions", since="yesterday")
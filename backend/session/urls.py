@@ -0,0 +1,19 @@
+from django.urls import path
+from .views import (
+    ExportView,
+    NearbyRestaurantsView,
+    NearbySuggestionsView,
+    RecommendedSuggestionsView,
+    RestaurantAutocompleteView,
+)
+
+urlpatterns = [
+    path("export", ExportView.as_view()),
+    path("restaurants/autocomplete", RestaurantAutocompleteView.as_view()),
+    path("<str:join_code>/restaurants/nearby", NearbyRestaurantsView.as_view()),
+    path("<str:join_code>/suggestions/nearby", NearbySuggestionsView.as_view()),
+    path(
+        "<str:join_code>/suggestions/recommended",
+        RecommendedSuggestionsView.as_view(),
+    ),
+]
@@ -1,3 +1,207 @@
-from django.shortcuts import render
+import math
 
-# Create your views here.
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import permissions
+from rest_framework.views import APIView
+from rest_framework.response import Response
+
+from api.throttling import SessionWriteRateThrottle
+from .catalog import TOP_K, get_catalog
+from .export import EXPORTS, FORMATS, encode, export_rows, parse_bound
+from .models import RestaurantSuggestion, Session
+from .recommender import get_recommender, session_user_ids
+from .sampling import alias_tables
+
+MAX_NEARBY_RESULTS = 50
+MAX_NEARBY_RADIUS_KM = 50
+MAX_RECOMMENDATIONS = 20
+
+
+def get_joined_session(request, join_code):
+    """
+    Returns the session with the join code if the requesting user created or
+    joined it, otherwise None
+    """
+    session = get_object_or_404(
+        Session.objects.with_membership(request.user), join_code=join_code
+    )
+    return session if session.is_member else None
+
+
+class RestaurantAutocompleteView(APIView):
+    def get(self, request, format=None):
+        query = request.query_params.get("q", "")
+
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return Response({"error": "limit must be a number"})
+
+        return Response(
+            {"results": get_catalog().autocomplete(query, max(1, min(limit, TOP_K)))}
+        )
+
+
+class NearbyRestaurantsView(APIView):
+    def get(self, request, join_code, format=None):
+        session = get_joined_session(request, join_code)
+        if session is None:
+            return Response({"error": "You are not a member of this session"})
+
+        params = request.query_params
+        try:
+            latitude = float(params.get("latitude", session.latitude))
+            longitude = float(params.get("longitude", session.longitude))
+            radius = float(params.get("radius", 5))
+            limit = int(params.get("limit", 10))
+        except (TypeError, ValueError):
+            return Response({"error": "A valid location, radius and limit are needed"})
+
+        if not all(map(math.isfinite, (latitude, longitude, radius))):
+            return Response({"error": "A valid location, radius and limit are needed"})
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return Response({"error": "Location is out of range"})
+
+        results = get_catalog().nearby(
+            latitude,
+            longitude,
+            min(radius, MAX_NEARBY_RADIUS_KM),
+            min(limit, MAX_NEARBY_RESULTS),
+        )
+        return Response({"results": results})
+
+
+class NearbySuggestionsView(APIView):
+    throttle_classes = (SessionWriteRateThrottle,)
+
+    def post(self, request, join_code, format=None):
+        session = get_joined_session(request, join_code)
+        if session is None:
+            return Response({"error": "You are not a member of this session"})
+        if session.stage not in ("0", "1"):
+            return Response({"error": "This session is no longer taking suggestions"})
+
+        ids = request.data.get("ids")
+        if not isinstance(ids, list):
+            return Response({"error": "ids must be a list of catalog ids"})
+        try:
+            ids = {int(i) for i in ids}
+        except (TypeError, ValueError):
+            return Response({"error": "ids must be a list of catalog ids"})
+
+        catalog = get_catalog()
+        found = [catalog.find(i) for i in ids]
+        if None in found:
+            return Response({"error": "Unknown catalog id"})
+
+        existing = set(session.suggestions.values_list("name", flat=True))
+        names = sorted({catalog.names[i].decode() for i in found} - existing)
+        suggestions = RestaurantSuggestion.objects.bulk_create(
+            RestaurantSuggestion(session=session, name=name) for name in names
+        )
+        # bulk_create skips the signals that keep the alias table current
+        alias_tables.invalidate(session.pk)
+
+        return Response(
+            {
+                "success": "Suggestions added",
+                "suggestions": [{"id": s.pk, "name": s.name} for s in suggestions],
+            }
+        )
+
+
+class RecommendedSuggestionsView(APIView):
+    throttle_classes = (SessionWriteRateThrottle,)
+
+    def get_throttles(self):
+        # Only seeding the session writes to it
+        if self.request.method != "POST":
+            return []
+        return super().get_throttles()
+
+    def recommend(self, session, limit):
+        """Returns up to limit recommendations for the session's members"""
+        existing = session.suggestions.values_list("name", flat=True)
+        return get_recommender().recommend(
+            session_user_ids(session),
+            max(1, min(limit, MAX_RECOMMENDATIONS)),
+            exclude=existing,
+        )
+
+    def get(self, request, join_code, format=None):
+        session = get_joined_session(request, join_code)
+        if session is None:
+            return Response({"error": "You are not a member of this session"})
+
+        try:
+            limit = int(request.query_params.get("limit", 5))
+        except ValueError:
+            return Response({"error": "limit must be a number"})
+
+        return Response(
+            {
+                "results": [
+                    {"name": name, "score": score}
+                    for name, score in self.recommend(session, limit)
+                ]
+            }
+        )
+
+    def post(self, request, join_code, format=None):
+        session = get_joined_session(request, join_code)
+        if session is None:
+            return Response({"error": "You are not a member of this session"})
+        if session.stage != "0":
+            return Response({"error": "Only a lobby can be seeded with suggestions"})
+
+        try:
+            limit = int(request.query_params.get("limit", 5))
+        except ValueError:
+            return Response({"error": "limit must be a number"})
+
+        suggestions = RestaurantSuggestion.objects.bulk_create(
+            RestaurantSuggestion(session=session, name=name)
+            for name, _ in self.recommend(session, limit)
+        )
+        # bulk_create skips the signals that keep the alias table current
+        alias_tables.invalidate(session.pk)
+
+        return Response(
+            {
+                "success": "Suggestions added",
+                "suggestions": [{"id": s.pk, "name": s.name} for s in suggestions],
+            }
+        )
+
+
+class ExportView(APIView):
+    permission_classes = (permissions.IsAdminUser,)
+
+    def perform_content_negotiation(self, request, force=False):
+        # Exports stream their own CSV or NDJSON, so the renderers only render
+        # errors and clients asking for text/csv shouldn't get a 406
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, format=None):
+        params = request.query_params
+        model = params.get("model", "sessions")
+        output = params.get("output", "ndjson")
+
+        if model not in EXPORTS:
+            return Response({"error": f"model must be one of {', '.join(EXPORTS)}"})
+        if output not in FORMATS:
+            return Response({"error": f"output must be one of {', '.join(FORMATS)}"})
+
+        try:
+            since = parse_bound(params.get("since"))
+            until = parse_bound(params.get("until"))
+        except ValueError as e:
+            return Response({"error": str(e)})
+
+        response = StreamingHttpResponse(
+            encode(model, export_rows(model, since, until), output),
+            content_type="text/csv" if output == "csv" else "application/x-ndjson",
+        )
+        response["Content-Disposition"] = f'attachment; filename="{model}.{output}"'
+        return response